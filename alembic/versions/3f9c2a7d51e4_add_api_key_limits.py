@@ -0,0 +1,32 @@
+"""add api key limits
+
+Revision ID: 3f9c2a7d51e4
+Revises: 6b695b01d43b
+Create Date: 2026-10-18 10:12:31.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d51e4'
+down_revision: Union[str, None] = '6b695b01d43b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('apikey', sa.Column('rate_limit_per_minute', sa.Integer(), nullable=True))
+    op.add_column('apikey', sa.Column('burst', sa.Integer(), nullable=True))
+    op.add_column('apikey', sa.Column('daily_quota', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('apikey', 'daily_quota')
+    op.drop_column('apikey', 'burst')
+    op.drop_column('apikey', 'rate_limit_per_minute')
@@ -0,0 +1,45 @@
+"""usage indexes and rollup
+
+Revision ID: 9d41e6b0c2a8
+Revises: 3f9c2a7d51e4
+Create Date: 2026-10-18 11:02:47.118350
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d41e6b0c2a8'
+down_revision: Union[str, None] = '3f9c2a7d51e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_usagelog_api_key_id_timestamp', 'usagelog', ['api_key_id', 'timestamp'], unique=False)
+    op.create_table('usagerollup',
+    sa.Column('api_key_id', sa.Integer(), nullable=False),
+    sa.Column('endpoint', sa.String(), nullable=False),
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['api_key_id'], ['apikey.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('api_key_id', 'endpoint', 'bucket')
+    )
+    op.create_index(op.f('ix_usagerollup_bucket'), 'usagerollup', ['bucket'], unique=False)
+    op.create_index(op.f('ix_usagerollup_id'), 'usagerollup', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_usagerollup_id'), table_name='usagerollup')
+    op.drop_index(op.f('ix_usagerollup_bucket'), table_name='usagerollup')
+    op.drop_table('usagerollup')
+    op.drop_index('ix_usagelog_api_key_id_timestamp', table_name='usagelog')
@@ -0,0 +1,42 @@
+"""usage rollup watermark
+
+Revision ID: c47e1a9b3d25
+Revises: 9d41e6b0c2a8
+Create Date: 2026-10-18 16:40:12.503771
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47e1a9b3d25'
+down_revision: Union[str, None] = '9d41e6b0c2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_usagelog_api_key_id_id', 'usagelog', ['api_key_id', 'id'], unique=False)
+    op.create_table('usagerollupstate',
+    sa.Column('last_usage_log_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_usagerollupstate_id'), 'usagerollupstate', ['id'], unique=False)
+    # Counts are now added on top of the rollup, so rebuild it from the
+    # start of the log once
+    op.execute('DELETE FROM usagerollup')
+    op.execute('INSERT INTO usagerollupstate (id, last_usage_log_id) VALUES (1, 0)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_usagerollupstate_id'), table_name='usagerollupstate')
+    op.drop_table('usagerollupstate')
+    op.drop_index('ix_usagelog_api_key_id_id', table_name='usagelog')
@@ -27,8 +27,9 @@ interface LegalResult {
   article_name: string;
   content: string;
 }
-interface ApiResponse {
-  results: LegalResult[];
+interface StreamResult {
+  rank: number;
+  result: LegalResult;
 }
 
 export default function App() {
@@ -65,24 +66,57 @@ export default function App() {
         body: JSON.stringify({
           prompt: input,
           top_k: 3,
+          stream: true,
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error("Failed to fetch response");
       }
 
-      const data: ApiResponse = await response.json();
-
-      // Format the results as markdown
-      const markdownContent = formatResultsAsMarkdown(data.results);
-
-      // Add assistant message
-      const assistantMessage: Message = {
-        role: "assistant",
-        content: markdownContent,
+      // Show the assistant message with the first article and add the
+      // rest to it as they arrive
+      const results: LegalResult[] = [];
+      const showResults = () => {
+        const assistantMessage: Message = {
+          role: "assistant",
+          content: formatResultsAsMarkdown(results),
+        };
+        setMessages((prev) =>
+          results.length === 1
+            ? [...prev, assistantMessage]
+            : [...prev.slice(0, -1), assistantMessage]
+        );
       };
-      setMessages((prev) => [...prev, assistantMessage]);
+
+      // Server-sent events: "start", one "result" per article, then "done"
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop() ?? "";
+        for (const event of events) {
+          const type = event.match(/^event: (.*)$/m)?.[1];
+          const data = event.match(/^data: (.*)$/m)?.[1];
+          if (type === "result" && data) {
+            const { result }: StreamResult = JSON.parse(data);
+            results.push(result);
+            showResults();
+          } else if (type === "error") {
+            throw new Error(data ?? "Search failed");
+          }
+        }
+      }
+      if (results.length === 0) {
+        setMessages((prev) => [
+          ...prev,
+          { role: "assistant", content: "No matching articles found." },
+        ]);
+      }
     } catch (error) {
       console.error("Error:", error);
       const errorMessage: Message = {
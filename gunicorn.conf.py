@@ -0,0 +1,9 @@
+# Picked up automatically by gunicorn when started from the project root.
+from src import config
+
+# Import main (and with PRELOAD_ENGINE=1 build the FaissEngine) once in the
+# master, then fork workers that share those pages.
+preload_app = config.preload_engine
+# Set here rather than with -w, so ENCODER_THREADS' default divides by the
+# worker count actually started
+workers = config.web_concurrency
@@ -1,16 +1,49 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from src.model_engine import FaissEngine
+from src import config
+from src.batching import MicroBatcher
+from src.inference import InferenceExecutor
+from src.middleware import ReceivedAt
 from src.routes.api_route import api_route
+from src.routes.health_routes import health_router
+from src.registry import build_engine, index_registry
+from src.startup import EngineLoader
+from src.usage import usage_writer
 from fastapi.middleware.cors import CORSMiddleware
 
 
+# With gunicorn's preload_app this runs once in the master, and the forked
+# workers share the loaded model, index and metadata.
+preloaded_engine = (
+    build_engine(index_registry.resolve()) if config.preload_engine else None
+)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Initialize the FAISS Engine once when the app starts
-    app.state.faiss_engine = FaissEngine()
+    # Queries run here rather than on the event loop
+    app.state.inference = InferenceExecutor(
+        backend=config.inference_backend,
+        workers=config.inference_workers,
+        queue_size=config.inference_queue_size,
+        timeout=config.inference_timeout,
+    )
+    app.state.batcher = MicroBatcher(
+        app.state.inference,
+        max_batch_size=config.micro_batch_max_size,
+        max_wait_ms=config.micro_batch_max_wait_ms,
+    )
+    # The FAISS engine loads in the background; /readyz says when it's done
+    app.state.faiss_engine = None
+    app.state.engine_loader = EngineLoader()
+    app.state.engine_loader.start(app, preloaded_engine)
+    usage_writer.start()
     yield
     # Clean up resources when the app shuts down
+    await usage_writer.stop()
+    app.state.engine_loader.stop()
+    await index_registry.stop()
+    app.state.inference.shutdown()
     app.state.faiss_engine = None
 
 
@@ -23,7 +56,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so the time is taken before CORS or any route work
+app.add_middleware(ReceivedAt)
+
 app.include_router(api_route)
+app.include_router(health_router)
 
 
 if __name__ == "__main__":
@@ -12,7 +12,7 @@ if str(parent_dir) not in sys.path:
 
 from src.database import AsyncSessionLocal, engine, Base  # noqa: E402
 from src.models import AdminUser  # noqa: E402
-from src.auth import get_password_hash  # noqa: E402
+from src.auth import get_password_hash_async  # noqa: E402
 import argparse  # noqa: E402
 
 
@@ -28,7 +28,7 @@ async def create_superuser(username=None, password=None, email=None):
     if not email:
         email = input("Email: ").strip()
 
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash_async(password)
 
     async with AsyncSessionLocal() as db:
         # Create tables if they don't exist
@@ -1,15 +1,21 @@
 from fastapi import Depends, Header, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from .models import APIKey, UsageLog, AdminUser
+from .models import APIKey, AdminUser
 from .database import get_db
+from .cache import TTLCache
+from .usage import usage_writer
+from .rate_limit import rate_limiter
+from . import config
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi.security import HTTPBearer
 
 
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 
@@ -20,10 +26,19 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt releases the GIL, so threads really do take it off the event loop
+password_executor = ThreadPoolExecutor(
+    max_workers=config.password_hash_workers, thread_name_prefix="bcrypt"
+)
 
 
 security = HTTPBearer()
 
+# key -> APIKey row (detached), so chat requests skip the apikey SELECT
+api_key_cache = TTLCache(config.api_key_cache_size, config.api_key_cache_ttl)
+# username -> AdminUser row (detached), so each admin call skips the SELECT
+admin_cache = TTLCache(1000, config.admin_cache_ttl)
+
 
 def verify_password(plain, hashed):
     return pwd_context.verify(plain, hashed)
@@ -33,6 +48,16 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain, hashed):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain, hashed)
+
+
+async def get_password_hash_async(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
@@ -59,29 +84,45 @@ async def get_current_admin(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
         )
 
-    result = await db.execute(select(AdminUser).where(AdminUser.username == username))
-    user = result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Admin not found"
+    user = admin_cache.get(username)
+    if user is None:
+        result = await db.execute(
+            select(AdminUser).where(AdminUser.username == username)
         )
+        user = result.scalar_one_or_none()
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Admin not found"
+            )
+        admin_cache.set(username, user)
     return user
 
 
-async def verify_api_key(
-    authorization: str = Query(..., alias="api_key"), db: AsyncSession = Depends(get_db)
+async def get_api_key(
+    authorization: str = Query(..., alias="api_key"),
+    db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(APIKey).where(APIKey.key == authorization))
-    api_key = result.scalar_one_or_none()
+    """The active APIKey for the ``api_key`` query parameter, or a 401."""
+    api_key = api_key_cache.get(authorization)
+    if api_key is None:
+        result = await db.execute(select(APIKey).where(APIKey.key == authorization))
+        api_key = result.scalar_one_or_none()
+        if api_key:
+            api_key_cache.set(authorization, api_key)
 
     if not api_key or not api_key.active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or inactive API Key",
         )
+    return api_key
 
-    log = UsageLog(api_key_id=api_key.id, endpoint="/v1/chat/completions")
-    db.add(log)
-    await db.commit()
 
-    return api_key
+async def throttle(api_key, endpoint, cost=1):
+    """Charge ``cost`` requests to the key's rate limit and quota, and log
+    one use of ``endpoint``."""
+    # Shed noisy clients before any embedding work is done
+    await rate_limiter.check(api_key, cost)
+
+    # Written in bulk by the background writer, not on the request path
+    usage_writer.log(api_key.id, endpoint)
@@ -0,0 +1,92 @@
+import asyncio
+from collections import Counter
+
+
+class MicroBatcher:
+    """Coalesces concurrent queries into one encode and one FAISS search.
+
+    Queries wait at most ``max_wait_ms`` for company; a batch is sent as soon
+    as ``max_batch_size`` queries are waiting. Each batch goes through the
+    InferenceExecutor as a single call to ``FaissEngine.query_batch`` and the
+    results are handed back to the individual callers.
+    """
+
+    def __init__(self, executor, max_batch_size=32, max_wait_ms=5.0):
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = Counter()
+
+    async def query(self, engine, question, top_k, *options, deadline=None):
+        """Search for one question; returns ``(hits, timings)``.
+
+        ``options`` are passed on to ``query_batch`` after ``top_ks`` (filters,
+        rerank); only queries with equal options share a batch. ``deadline``
+        (``time.monotonic()``) is the question's own re-ranking deadline and
+        is passed on in ``deadlines``.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((engine, question, top_k, options, deadline, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_wait, self._flush
+            )
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # Queries with different options need separate searches, and a hot
+        # swapped engine may briefly share the queue with the old one.
+        groups = {}
+        for item in batch:
+            groups.setdefault((id(item[0]), item[3]), []).append(item)
+        for items in groups.values():
+            task = asyncio.create_task(self._run(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items):
+        self.batches += 1
+        self.items += len(items)
+        self.batch_sizes[len(items)] += 1
+        engine, options = items[0][0], items[0][3]
+        deadlines = [item[4] for item in items]
+        if any(deadline is not None for deadline in deadlines):
+            options = (*options, deadlines)
+        try:
+            results, timings = await self.executor.run(
+                engine,
+                "query_batch",
+                [item[1] for item in items],
+                [item[2] for item in items],
+                *options,
+            )
+        except Exception as e:
+            for *_, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (*_, future), result in zip(items, results):
+            # The caller may have gone away (client disconnect)
+            if not future.done():
+                future.set_result((result, timings))
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
@@ -1 +1,137 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
 max_top_k = 10
+
+# gunicorn worker processes. gunicorn.conf.py starts this many, so the
+# per-process budgets below can divide the machine between them.
+web_concurrency = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+# Inference executor: "thread" runs FaissEngine calls in a thread pool of the
+# worker process, "process" runs them in child processes that each load their
+# own engine (more memory, but no GIL contention with the event loop).
+inference_backend = os.getenv("INFERENCE_BACKEND", "thread")
+inference_workers = int(os.getenv("INFERENCE_WORKERS", "2"))
+# How many calls may wait for a free inference worker before we shed load.
+inference_queue_size = int(os.getenv("INFERENCE_QUEUE_SIZE", "32"))
+# Seconds a request may wait for its inference result (queueing included).
+inference_timeout = float(os.getenv("INFERENCE_TIMEOUT", "10"))
+
+# Micro-batching: concurrent chat queries are encoded and searched together.
+# A batch is sent when it is full or its oldest query has waited this long.
+micro_batch_max_size = int(os.getenv("MICRO_BATCH_MAX_SIZE", "32"))
+micro_batch_max_wait_ms = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5"))
+
+# Batch endpoint: most prompts per request, and how many are searched per
+# inference call (also the granularity of the NDJSON stream).
+max_batch_prompts = int(os.getenv("MAX_BATCH_PROMPTS", "1000"))
+batch_chunk_size = int(os.getenv("BATCH_CHUNK_SIZE", "64"))
+
+# Caches in front of FaissEngine: query embeddings keyed on the normalized
+# prompt, and search results keyed on (prompt, top_k). Each engine has its
+# own, so a rebuilt index starts with empty caches once it is swapped in
+# (INDEX_WATCH or POST /api/admin/index/reload). A size of 0 disables a cache.
+embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+result_cache_size = int(os.getenv("RESULT_CACHE_SIZE", "4096"))
+cache_ttl = float(os.getenv("CACHE_TTL", "3600"))
+# Prepared FAISS selectors for the most recently used filter combinations
+filter_cache_size = int(os.getenv("FILTER_CACHE_SIZE", "256"))
+
+# Memory sharing between gunicorn workers. INDEX_MMAP memory-maps the FAISS
+# index instead of reading it into each worker, and PRELOAD_ENGINE builds the
+# engine in the gunicorn master (see gunicorn.conf.py) so workers inherit the
+# model and metadata copy-on-write instead of loading their own.
+index_mmap = os.getenv("INDEX_MMAP", "0") == "1"
+preload_engine = os.getenv("PRELOAD_ENGINE", "0") == "1"
+
+# Search-time knobs for approximate index types built with
+# `trainer/embed_index.py --index-type`; ignored by flat indexes.
+ivf_nprobe = int(os.getenv("IVF_NPROBE", "16"))
+hnsw_ef_search = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+# Hybrid retrieval (opt in with HYBRID_SEARCH=1): fuse BM25 hits with the
+# FAISS ones by reciprocal-rank fusion. Each side contributes
+# top_k * HYBRID_CANDIDATES candidates, and articles named in the prompt
+# ("Article 539") always come first.
+hybrid_search = os.getenv("HYBRID_SEARCH", "0") == "1"
+hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES", "4"))
+rrf_k = int(os.getenv("RRF_K", "60"))
+
+# API keys are cached per worker for API_KEY_CACHE_TTL seconds. Deactivation
+# evicts the key at once in the worker that handled it; other workers notice
+# when their copy expires.
+api_key_cache_size = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+api_key_cache_ttl = float(os.getenv("API_KEY_CACHE_TTL", "60"))
+
+# Usage logs are buffered and bulk inserted every USAGE_FLUSH_INTERVAL
+# seconds, or sooner once USAGE_FLUSH_SIZE rows are waiting.
+usage_flush_interval = float(os.getenv("USAGE_FLUSH_INTERVAL", "2"))
+usage_flush_size = int(os.getenv("USAGE_FLUSH_SIZE", "500"))
+
+# Per-key throttling, checked before any embedding work. Keys without their
+# own limits use these defaults; 0 means unlimited. With the default "memory"
+# backend every gunicorn worker keeps its own buckets, so the effective limit
+# is multiplied by the worker count; point RATE_LIMIT_BACKEND at a
+# redis:// URL to share them.
+default_rate_limit_per_minute = int(os.getenv("DEFAULT_RATE_LIMIT_PER_MINUTE", "120"))
+default_daily_quota = int(os.getenv("DEFAULT_DAILY_QUOTA", "0"))
+rate_limit_backend = os.getenv("RATE_LIMIT_BACKEND", "memory")
+
+# bcrypt hashing/verification runs in its own small thread pool, so logins
+# cannot stall chat requests on the event loop or hog all the cores.
+password_hash_workers = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Seconds an authenticated admin's row is reused before re-reading it
+admin_cache_ttl = float(os.getenv("ADMIN_CACHE_TTL", "30"))
+
+# Optional cross-encoder re-ranking. When enabled, requests with rerank=true
+# over-fetch top_k * RERANK_CANDIDATES hits and re-order them with
+# RERANK_MODEL, RERANK_BATCH_SIZE pairs at a time. Once RERANK_BUDGET_MS have
+# passed since the request arrived, no further pairs are scored and it keeps
+# the bi-encoder order instead.
+rerank_enabled = os.getenv("RERANK_ENABLED", "0") == "1"
+rerank_model = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Local directory holding the cross-encoder, loaded offline like MODEL_PATH
+rerank_model_path = os.getenv("RERANK_MODEL_PATH", "")
+rerank_candidates = int(os.getenv("RERANK_CANDIDATES", "3"))
+rerank_budget_ms = float(os.getenv("RERANK_BUDGET_MS", "250"))
+rerank_batch_size = max(1, int(os.getenv("RERANK_BATCH_SIZE", "16")))
+
+# Query encoder: "torch" (fp32 SentenceTransformer), "torch-int8" (dynamically
+# quantized) or "onnx" (ONNX Runtime over ONNX_MODEL_DIR, written by
+# `python -m trainer.export_onnx`). ENCODER_THREADS caps the intra-op threads
+# of each encode; the default splits the cores between the WEB_CONCURRENCY
+# gunicorn workers times their INFERENCE_WORKERS concurrent searches, so they
+# don't oversubscribe the CPU.
+encoder_backend = os.getenv("ENCODER_BACKEND", "torch")
+onnx_model_dir = os.getenv("ONNX_MODEL_DIR", "models/all-MiniLM-L6-v2-onnx")
+encoder_threads = int(
+    os.getenv(
+        "ENCODER_THREADS",
+        str(max(1, (os.cpu_count() or 1) // (web_concurrency * inference_workers))),
+    )
+)
+
+# Local directory holding the sentence-transformers model (e.g. one written by
+# SentenceTransformer("all-MiniLM-L6-v2").save(...)). When set the model is
+# loaded from disk with no Hugging Face hub lookup, so startup works offline.
+model_path = os.getenv("MODEL_PATH", "")
+
+# Index versions (see src/registry.py). Without INDEX_REGISTRY the API serves
+# INDEX_FILE + METADATA_FILE. With INDEX_WATCH=1 every worker reloads, in the
+# background, when those files (or the registry's active version) change;
+# changes are picked up once they have been quiet for INDEX_WATCH_DEBOUNCE_MS.
+index_file = os.getenv("INDEX_FILE", "criminal_code_v2.index")
+metadata_file = os.getenv("METADATA_FILE", "faiss_metadata_v2.json")
+index_registry = os.getenv("INDEX_REGISTRY", "")
+index_watch = os.getenv("INDEX_WATCH", "0") == "1"
+index_watch_debounce_ms = int(os.getenv("INDEX_WATCH_DEBOUNCE_MS", "2000"))
+
+# Indexes built with chunking (trainer/embed_index.py --chunk-words) hold one
+# vector per window of a long article. Searches over-fetch CHUNK_CANDIDATES
+# times as many vectors so that top_k distinct articles remain, and score an
+# article as its best chunk ("max") or the sum of its chunks that matched
+# ("sum", which favours articles that match in several places).
+chunk_aggregation = os.getenv("CHUNK_AGGREGATION", "max")
+chunk_candidates = int(os.getenv("CHUNK_CANDIDATES", "3"))
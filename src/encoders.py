@@ -0,0 +1,126 @@
+"""Query encoders for FaissEngine.
+
+All backends produce the same MiniLM sentence embeddings (mean-pooled, unit
+length) and share the ``encode(texts, normalize_embeddings=True)`` call of
+SentenceTransformer, so the engine doesn't care which one it got:
+
+- ``torch``: the original fp32 SentenceTransformer.
+- ``torch-int8``: the same model with its Linear layers dynamically
+  quantized to int8. Smaller and faster on CPU, no export step.
+- ``onnx``: an ONNX Runtime session over a model exported with
+  ``python -m trainer.export_onnx`` (optionally int8-quantized there).
+"""
+
+import json
+import os
+
+import numpy as np
+
+from src import config
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+
+def load_encoder(backend=None, threads=None):
+    backend = backend or config.encoder_backend
+    threads = config.encoder_threads if threads is None else threads
+    if backend == "onnx":
+        return OnnxEncoder(config.onnx_model_dir, threads)
+    if backend in ("torch", "torch-int8"):
+        return torch_encoder(quantize=backend == "torch-int8", threads=threads)
+    raise ValueError(f"ENCODER_BACKEND must be one of {BACKENDS}, got {backend!r}")
+
+
+def torch_encoder(quantize=False, threads=0, model_name=None):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        torch.set_num_threads(threads)
+    model_name = model_name or config.model_path or MODEL_NAME
+    # A local directory (MODEL_PATH) loads without asking the hub anything
+    model = SentenceTransformer(
+        model_name, device="cpu", local_files_only=os.path.isdir(model_name)
+    )
+    if quantize:
+        # Swaps every nn.Linear for an int8 one; weights are quantized now,
+        # activations per call.
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
+
+
+def load_reranker():
+    from sentence_transformers import CrossEncoder
+
+    model_name = config.rerank_model_path or config.rerank_model
+    # Like MODEL_PATH, a local directory loads without asking the hub anything
+    return CrossEncoder(
+        model_name, device="cpu", local_files_only=os.path.isdir(model_name)
+    )
+
+
+class OnnxEncoder:
+    """Tokenizer + ONNX transformer + mean pooling, without torch."""
+
+    def __init__(self, model_dir, threads=0):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("ENCODER_BACKEND=onnx needs `pip install onnxruntime`")
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, "encoder.json")) as f:
+            info = json.load(f)
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        # One request is one run(); parallelism between them is the workers' job
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, info["model_file"]),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(info["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=info.get("pad_token_id", 0))
+        self.dimension = info["dimension"]
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, texts, normalize_embeddings=False, batch_size=32, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        chunks = [
+            self._encode(texts[i : i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ]
+        embeddings = (
+            np.concatenate(chunks)
+            if chunks
+            else np.zeros((0, self.dimension), dtype=np.float32)
+        )
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.maximum(norms, 1e-12)
+        return embeddings
+
+    def _encode(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array(
+                [e.attention_mask for e in encodings], dtype=np.int64
+            ),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        # Mean over real tokens, as the sentence-transformers Pooling layer does
+        mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+        inputs = {name: value for name, value in inputs.items() if name in self.input_names}
+        (hidden,) = self.session.run(["last_hidden_state"], inputs)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
@@ -0,0 +1,22 @@
+"""Names and fingerprints of the files that make up an index.
+
+Kept free of faiss so the registry and the trainer can use them without
+loading it.
+"""
+
+import os
+
+
+def file_version(*paths) -> str:
+    """Cheap fingerprint of files on disk, changes whenever one is rewritten."""
+    parts = []
+    for path in paths:
+        st = os.stat(path)
+        parts.append(f"{st.st_mtime_ns:x}-{st.st_size:x}")
+    return ".".join(parts)
+
+
+def ids_path(index_file: str) -> str:
+    """(vector id, metadata row) pairs, written next to incrementally built
+    indexes. Long articles are split into chunks, so a row may have several."""
+    return os.path.splitext(index_file)[0] + ".ids.npy"
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+
+# Engines loaded inside process-pool children, keyed by FaissEngine.spec.
+_process_engines = {}
+
+
+def _call_in_process(spec, method, args):
+    engine = _process_engines.get(spec)
+    if engine is None:
+        from src.model_engine import FaissEngine
+
+        engine = _process_engines[spec] = FaissEngine(*spec)
+        # Keep the previous version for requests still in flight on it
+        while len(_process_engines) > 2:
+            del _process_engines[next(iter(_process_engines))]
+    return getattr(engine, method)(*args)
+
+
+class InferenceExecutor:
+    """Runs FaissEngine calls off the event loop with a bounded queue.
+
+    At most ``workers`` calls run at once and at most ``queue_size`` more may
+    wait for a slot. Anything beyond that is rejected with a 503 straight away,
+    and callers waiting longer than ``timeout`` seconds get a 504, so latency
+    stays bounded instead of tracking queue depth.
+    """
+
+    def __init__(self, backend="thread", workers=2, queue_size=32, timeout=10.0):
+        if backend == "process":
+            self._pool = ProcessPoolExecutor(max_workers=workers)
+        elif backend == "thread":
+            self._pool = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="inference"
+            )
+        else:
+            raise ValueError(f"Unknown inference backend: {backend}")
+        self.backend = backend
+        self.workers = workers
+        self.max_pending = workers + queue_size
+        self.timeout = timeout
+        self.pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._lock = threading.Lock()
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    def _submit(self, engine, method, args):
+        if self.backend == "process":
+            return self._pool.submit(_call_in_process, engine.spec, method, args)
+        return self._pool.submit(getattr(engine, method), *args)
+
+    async def run(self, engine, method, *args):
+        """Call ``engine.<method>(*args)`` in the pool and await the result."""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Inference queue is full, try again later",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+
+        # The slot is released when the work itself finishes, not when the
+        # caller gives up, so timed out calls still count against the queue.
+        try:
+            future = self._submit(engine, method, args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Inference timed out",
+            )
+
+    async def warm_up(self, engine):
+        """Call ``engine.warm_up()`` in the pool, bypassing the queue limit and
+        timeout. Process children each build their own engine on first use,
+        so those get one call per worker."""
+        calls = self.workers if self.backend == "process" else 1
+        futures = [self._submit(engine, "warm_up", ()) for _ in range(calls)]
+        await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
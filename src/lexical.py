@@ -0,0 +1,137 @@
+"""In-memory BM25 index over the article metadata.
+
+MiniLM embeddings are weak at exact legal terms and article numbers
+("Article 539", "aggravated homicide"), so FaissEngine fuses these lexical
+hits with the dense ones. The index is built by ``trainer/embed_index.py``
+and saved next to the FAISS index, so the API never re-tokenizes the corpus.
+"""
+
+import json
+import math
+import os
+import re
+
+import numpy as np
+
+FIELDS = ("content", "article_name", "chapter_name")
+# Headings say more about an article than any one sentence of its body
+FIELD_WEIGHTS = {"content": 1, "article_name": 3, "chapter_name": 2}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# "Article 539", "Art. 32", "Arts 32 and 33", "Articles 539-541", ...
+ARTICLE_RE = re.compile(
+    r"\bart(?:icles?|s)?\.?\s*(\d+(?:\s*(?:,|&|and|or|-|–|to)\s*\d+)*)\b",
+    re.IGNORECASE,
+)
+RANGE_RE = re.compile(r"(\d+)(?:\s*(?:-|–|to)\s*(\d+))?")
+# Longer ranges are more likely a typo than a request for every article
+MAX_ARTICLE_RANGE = 20
+STOPWORDS = frozenset(
+    "a an and any are as at be by for from has have he in is it its may of on "
+    "or shall such that the this to was where which who with".split()
+)
+
+
+def bm25_path(index_file: str) -> str:
+    return os.path.splitext(index_file)[0] + ".bm25.json"
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def article_numbers(text: str) -> list[str]:
+    """Article numbers referenced in a query, in order, e.g. "Art. 539" ->
+    ["539"] and "Articles 32 and 35-37" -> ["32", "35", "36", "37"]."""
+    numbers = []
+    for citation in ARTICLE_RE.findall(text):
+        for first, last in RANGE_RE.findall(citation):
+            start, end = int(first), int(last or first)
+            if 0 <= end - start <= MAX_ARTICLE_RANGE:
+                numbers.extend(str(n) for n in range(start, end + 1))
+            else:
+                numbers.extend((str(start), str(end)))
+    return list(dict.fromkeys(numbers))
+
+
+class BM25Index:
+    def __init__(self, postings, doc_lengths, articles, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        avg_length = float(self.doc_lengths.mean()) if len(doc_lengths) else 0.0
+        # Length normalization per document, independent of the query
+        self._norm = k1 * (1 - b + b * self.doc_lengths / (avg_length or 1))
+        # term -> (rows, term frequencies)
+        self.postings = {
+            term: (np.asarray(rows, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (rows, tfs) in postings.items()
+        }
+        # article number -> rows holding that article
+        self.articles = articles
+
+    @classmethod
+    def build(cls, records):
+        postings = {}
+        doc_lengths = []
+        articles = {}
+        for row, record in enumerate(records):
+            counts = {}
+            for field in FIELDS:
+                for token in tokenize(record.get(field) or ""):
+                    counts[token] = counts.get(token, 0) + FIELD_WEIGHTS[field]
+            for token, tf in counts.items():
+                rows, tfs = postings.setdefault(token, ([], []))
+                rows.append(row)
+                tfs.append(tf)
+            doc_lengths.append(sum(counts.values()))
+            number = record.get("article_number")
+            if number:
+                articles.setdefault(number, []).append(row)
+        return cls(postings, doc_lengths, articles)
+
+    def save(self, path: str):
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_lengths": self.doc_lengths.astype(int).tolist(),
+            "articles": self.articles,
+            "postings": {
+                term: [rows.tolist(), tfs.astype(int).tolist()]
+                for term, (rows, tfs) in self.postings.items()
+            },
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            data["postings"], data["doc_lengths"], data["articles"], data["k1"], data["b"]
+        )
+
+    def search(self, query: str, k: int) -> list[tuple[int, float]]:
+        """Top ``k`` ``(row, score)`` pairs by BM25."""
+        n_docs = len(self.doc_lengths)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            rows, tfs = posting
+            idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[rows])
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k)[:k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(int(row), float(scores[row])) for row in matched]
+
+    def article_rows(self, query: str) -> list[int]:
+        """Rows of the articles a query names explicitly, in query order."""
+        rows = []
+        for number in article_numbers(query):
+            rows.extend(r for r in self.articles.get(number, ()) if r not in rows)
+        return rows
@@ -0,0 +1,204 @@
+"""Compact, memory-mappable metadata store.
+
+The JSON metadata file is parsed into one dict per article in every gunicorn
+worker. A ``.store`` file holds the same records column by column: each field
+is an array of string ids into one UTF-8 buffer, and short values (book,
+chapter and section names, ...) are interned so repeats are stored once. The
+file is opened with ``mmap``, so all workers share the page cache copy, and a
+field is only decoded when it is read.
+
+Layout (little-endian)::
+
+    header   magic, record count, field count, string count, names length
+    names    JSON list of field names, padded to 8 bytes
+    columns  uint32[field count][record count] string ids
+    offsets  uint64[string count + 1] into the buffer
+    buffer   UTF-8 text
+
+Build one next to the JSON file with ``trainer/embed_index.py`` or::
+
+    python -m src.metadata_store faiss_metadata_v2.json
+"""
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+MAGIC = b"ECMETA02"
+HEADER = struct.Struct("<8sIIII")
+# Values up to this many bytes are interned; longer ones (article content)
+# are almost always unique and would only bloat the intern table.
+INTERN_MAX_BYTES = 256
+
+
+def store_path(json_path: str) -> str:
+    return os.path.splitext(json_path)[0] + ".store"
+
+
+def _pad8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class MetadataStoreWriter:
+    """Writes a ``.store`` file one record at a time.
+
+    Text goes straight to a temporary file, so memory only grows with the
+    id columns and the intern table, not with the corpus text.
+    """
+
+    def __init__(self, path: str, fields: list[str]):
+        self.path = path
+        self.fields = list(fields)
+        self._columns = [array("I") for _ in self.fields]
+        self._offsets = array("Q", [0])
+        self._interned = {}
+        self._buffer = tempfile.TemporaryFile(dir=os.path.dirname(path) or ".")
+
+    def _string_id(self, value: str) -> int:
+        data = value.encode("utf-8")
+        intern = len(data) <= INTERN_MAX_BYTES
+        if intern and value in self._interned:
+            return self._interned[value]
+        self._buffer.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        string_id = len(self._offsets) - 2
+        if intern:
+            self._interned[value] = string_id
+        return string_id
+
+    def add(self, record: dict):
+        for column, field in zip(self._columns, self.fields):
+            value = record.get(field)
+            column.append(self._string_id("" if value is None else str(value)))
+
+    def close(self):
+        names = json.dumps(self.fields).encode("utf-8")
+        count = len(self._columns[0]) if self._columns else 0
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(
+                HEADER.pack(
+                    MAGIC, count, len(self.fields), len(self._offsets) - 1, len(names)
+                )
+            )
+            f.write(names.ljust(_pad8(len(names)), b" "))
+            for column in self._columns:
+                f.write(column.tobytes())
+            if count * len(self.fields) % 2:
+                f.write(b"\0" * 4)
+            f.write(self._offsets.tobytes())
+            self._buffer.seek(0)
+            shutil.copyfileobj(self._buffer, f)
+        self._buffer.close()
+        os.replace(tmp_path, self.path)
+
+
+def write_metadata_store(records, path: str, fields: list[str] | None = None):
+    records = iter(records)
+    first = next(records, None)
+    if fields is None:
+        fields = list(first) if first else []
+    writer = MetadataStoreWriter(path, fields)
+    if first is not None:
+        writer.add(first)
+        for record in records:
+            writer.add(record)
+    writer.close()
+
+
+class MetadataStore:
+    """Read-only, list-like view of a ``.store`` file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, n_fields, n_strings, names_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a metadata store")
+        self._count = count
+        pos = HEADER.size
+        self.fields = json.loads(bytes(self._mm[pos : pos + names_len]))
+        self._field_index = {name: i for i, name in enumerate(self.fields)}
+        pos += _pad8(names_len)
+
+        view = memoryview(self._mm)
+        columns_end = pos + 4 * count * n_fields
+        self._columns = view[pos:columns_end].cast("I")
+        pos = _pad8(columns_end)
+        self._offsets = view[pos : pos + 8 * (n_strings + 1)].cast("Q")
+        self._buffer = view[pos + 8 * (n_strings + 1) :]
+        # Interned values repeat across records, so decode each of them once
+        self._decoded = {}
+
+    def __len__(self):
+        return self._count
+
+    def _string(self, string_id: int) -> str:
+        value = self._decoded.get(string_id)
+        if value is None:
+            start, end = self._offsets[string_id], self._offsets[string_id + 1]
+            value = str(self._buffer[start:end], "utf-8")
+            if end - start <= INTERN_MAX_BYTES:
+                self._decoded[string_id] = value
+        return value
+
+    def _check_row(self, row: int) -> int:
+        if row < 0:
+            row += self._count
+        if not 0 <= row < self._count:
+            raise IndexError(row)
+        return row
+
+    def field(self, row: int, name: str) -> str:
+        """Decode a single field of a record."""
+        row = self._check_row(row)
+        return self._string(self._columns[self._field_index[name] * self._count + row])
+
+    def __getitem__(self, row: int) -> dict:
+        row = self._check_row(row)
+        return {
+            name: self._string(self._columns[i * self._count + row])
+            for i, name in enumerate(self.fields)
+        }
+
+    def __iter__(self):
+        for row in range(self._count):
+            yield self[row]
+
+
+class JsonMetadata(list):
+    """Plain JSON metadata with the same accessors as MetadataStore."""
+
+    @property
+    def fields(self):
+        return list(self[0]) if self else []
+
+    def field(self, row: int, name: str) -> str:
+        return self[row].get(name, "")
+
+
+def load_metadata(path: str):
+    """Return ``(records, path_loaded)`` for a JSON metadata file.
+
+    An up to date ``.store`` sibling is preferred over the JSON file itself.
+    """
+    sibling = store_path(path)
+    if os.path.exists(sibling) and (
+        not os.path.exists(path) or os.path.getmtime(sibling) >= os.path.getmtime(path)
+    ):
+        return MetadataStore(sibling), sibling
+    with open(path, "r", encoding="utf-8") as f:
+        return JsonMetadata(json.load(f)), path
+
+
+if __name__ == "__main__":
+    json_file = sys.argv[1] if len(sys.argv) > 1 else "faiss_metadata_v2.json"
+    with open(json_file, "r", encoding="utf-8") as f:
+        write_metadata_store(json.load(f), store_path(json_file))
+    print(f"Metadata store written to {store_path(json_file)}")
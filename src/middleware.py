@@ -0,0 +1,14 @@
+import time
+
+
+class ReceivedAt:
+    """Stamps each HTTP request with its arrival time, ``request.state.received``
+    (``time.monotonic()``), so budgets can count time spent queued."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["received"] = time.monotonic()
+        await self.app(scope, receive, send)
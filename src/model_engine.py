@@ -1,6 +1,38 @@
-import json
+import os
+import time
+
 import faiss
-from sentence_transformers import SentenceTransformer
+import numpy as np
+import orjson
+
+from src import config
+from src.cache import TTLCache
+from src.encoders import MODEL_NAME, load_encoder, load_reranker
+from src.index_files import file_version, ids_path
+from src.lexical import BM25Index, bm25_path
+from src.metadata_store import load_metadata
+
+# Hierarchy levels a search can be restricted to (see SearchFilters)
+FILTER_FIELDS = ("book_roman", "title_roman", "chapter_roman", "section_roman_or_arabic")
+
+
+def normalize_prompt(text: str) -> str:
+    # The MiniLM tokenizer is uncased and splits on whitespace, so neither
+    # case nor spacing changes the embedding.
+    return " ".join(text.split()).lower()
+
+
+def tune_index(index):
+    """Apply the configured search parameters to IVF and HNSW indexes."""
+    ps = faiss.ParameterSpace()
+    for name, value in (
+        ("nprobe", config.ivf_nprobe),
+        ("efSearch", config.hnsw_ef_search),
+    ):
+        try:
+            ps.set_index_parameter(index, name, value)
+        except RuntimeError:
+            pass  # not this kind of index
 
 
 class FaissEngine:
@@ -8,14 +40,440 @@ class FaissEngine:
         self,
         index_file="criminal_code_v2.index",
         metadata_file="faiss_metadata_v2.json",
+        name=None,
     ):
-        self.index = faiss.read_index(index_file)
+        # Enough to rebuild this engine elsewhere, e.g. in an inference process.
+        self.spec = (index_file, metadata_file, name)
+        self.index_file = index_file
+        self.index = self._read_index(index_file)
+        tune_index(self.index)
+        index = faiss.downcast_index(self.index)
+        if isinstance(index, faiss.IndexIDMap):
+            # Incremental builds wrap the real index to keep stable ids
+            index = faiss.downcast_index(index.index)
+        self.index_type = type(index).__name__
+        # Indexes built since cosine support use inner product on unit
+        # vectors; older ones are L2 over the same (already unit-norm) MiniLM
+        # embeddings, where cosine = 1 - d / 2.
+        self.inner_product = self.index.metric_type == faiss.METRIC_INNER_PRODUCT
+        try:
+            # Lets IVF indexes reconstruct vectors to score lexical-only hits
+            faiss.extract_index_ivf(self.index).make_direct_map()
+        except RuntimeError:
+            pass
         self.metadata_file = metadata_file
-        with open(metadata_file, "r", encoding="utf-8") as f:
-            self.metadata = json.load(f)
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-
-    def query(self, question: str, top_k: int = 3):
-        q_embedding = self.model.encode([question])
-        D, I = self.index.search(q_embedding, top_k)
-        return [self.metadata[i] for i in I[0]]
+        # A list of dicts, or a memory-mapped MetadataStore when one was built
+        self.metadata, self.metadata_path = load_metadata(metadata_file)
+        # Vector ids are metadata rows, except for indexes from incremental
+        # builds, whose ids are stable per article chunk and mapped through here.
+        self._vector_ids, self._vector_rows = self._load_ids()
+        if self._vector_ids is None:
+            self._row_ids = self._id_rows = None
+            self._id_bound = self.index.ntotal
+            self.chunked = False
+        else:
+            self._check_ids()
+            self._id_bound = int(self._vector_ids.max(initial=-1)) + 1
+            self._id_rows = np.full(self._id_bound, -1, dtype=np.int64)
+            self._id_rows[self._vector_ids] = self._vector_rows
+            # Each row's first vector; all of a row's chunks share its filters
+            self._row_ids = np.empty(len(self.metadata), dtype=np.int64)
+            self._row_ids[self._vector_rows[::-1]] = self._vector_ids[::-1]
+            self.chunked = len(self._vector_ids) > len(self.metadata)
+        self.lexical = self._load_lexical() if config.hybrid_search else None
+        self._node_bitmaps = self._build_node_bitmaps()
+        # Each record's JSON minus its closing brace, encoded once at load so
+        # no request pays for it
+        self._fragments = [orjson.dumps(record)[:-1] for record in self.metadata]
+        # Filter combinations come from clients, so keep only recent ones
+        self._selectors = TTLCache(config.filter_cache_size, config.cache_ttl)
+        self.model = load_encoder()
+        self.reranker = None
+        if config.rerank_enabled:
+            self.reranker = load_reranker()
+
+        self.version = self._current_version()
+        # The index version reported to clients (see src/registry.py)
+        self.name = name or self.version
+        self.embedding_cache = TTLCache(config.embedding_cache_size, config.cache_ttl)
+        self.result_cache = TTLCache(config.result_cache_size, config.cache_ttl)
+
+    @staticmethod
+    def _read_index(index_file):
+        if not config.index_mmap:
+            return faiss.read_index(index_file)
+        # IO_FLAG_MMAP maps IVF lists; IO_FLAG_MMAP_IFC (newer faiss) also maps
+        # the codes of flat indexes instead of copying them onto the heap.
+        flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        return faiss.read_index(index_file, flags | faiss.IO_FLAG_READ_ONLY)
+
+    def _load_lexical(self):
+        path = bm25_path(self.index_file)
+        if os.path.exists(path):
+            return BM25Index.load(path)
+        # Indexes built before hybrid search have no BM25 file next to them
+        return BM25Index.build(self.metadata)
+
+    def _load_ids(self):
+        path = ids_path(self.index_file)
+        if not os.path.exists(path):
+            return None, None
+        mapping = np.load(path)
+        if mapping.ndim == 1:
+            # Written before chunking: one vector per row, listed in row order
+            return mapping, np.arange(len(mapping))
+        return mapping[:, 0], mapping[:, 1]
+
+    def _check_ids(self):
+        rows = self._vector_rows
+        if not (
+            len(rows) == self.index.ntotal
+            and len(np.unique(rows)) == len(self.metadata)
+            and (len(rows) == 0 or 0 <= rows.min() <= rows.max() < len(self.metadata))
+        ):
+            # Caught mid-rebuild; loading again once it's done will work
+            raise ValueError(f"{self.index_file} and {self.metadata_file} don't match")
+
+    def _vector_id(self, row):
+        return row if self._row_ids is None else int(self._row_ids[row])
+
+    def _chunk_ids(self, row):
+        if self._vector_ids is None:
+            return [row]
+        return self._vector_ids[self._vector_rows == row].tolist()
+
+    def _rows(self, ids):
+        """Metadata rows for an array of search result ids (-1 stays -1)."""
+        if self._id_rows is None:
+            return ids
+        return np.where(ids >= 0, self._id_rows[np.maximum(ids, 0)], -1)
+
+    def _build_node_bitmaps(self):
+        """One packed id bitset per hierarchy node, e.g. ("book_roman", "V")."""
+        rows = {}
+        for row in range(len(self.metadata)):
+            for field in FILTER_FIELDS:
+                value = self.metadata.field(row, field)
+                if value:
+                    rows.setdefault((field, value.upper()), []).append(row)
+        bitmaps = {}
+        for node, node_rows in rows.items():
+            bits = np.zeros(self._id_bound, dtype=bool)
+            if self._vector_ids is None:
+                bits[node_rows] = True
+            else:
+                # Every chunk of the node's articles, not just the first
+                bits[self._vector_ids[np.isin(self._vector_rows, node_rows)]] = True
+            # IDSelectorBitmap reads bit i of byte i // 8, least significant first
+            bitmaps[node] = np.packbits(bits, bitorder="little")
+        return bitmaps
+
+    def _selector(self, filters):
+        """``(bitmap, IDSelectorBitmap)`` restricting a search to ``filters``, or
+        None when a filter names a book/title/chapter/section with no articles."""
+        if any(node not in self._node_bitmaps for node in filters):
+            return None
+        selector = self._selectors.get(filters)
+        if selector is None:
+            bitmap = np.bitwise_and.reduce([self._node_bitmaps[node] for node in filters])
+            # The selector only points at bitmap, so keep both alive together
+            sel = faiss.IDSelectorBitmap(self._id_bound, faiss.swig_ptr(bitmap))
+            selector = (bitmap, sel)
+            self._selectors.set(filters, selector)
+        return selector
+
+    def _search_params(self, sel):
+        """Search parameters for one search through ``sel``.
+
+        Built per call, not cached with the selector: IndexIDMap's search
+        swaps ``params.sel`` for a translating selector while it runs, so
+        concurrent searches must not share one object.
+        """
+        # Typed params, since passing any replaces the tuned defaults
+        if "IVF" in self.index_type:
+            return faiss.SearchParametersIVF(sel=sel, nprobe=config.ivf_nprobe)
+        if "HNSW" in self.index_type:
+            return faiss.SearchParametersHNSW(sel=sel, efSearch=config.hnsw_ef_search)
+        return faiss.SearchParameters(sel=sel)
+
+    def _allowed(self, bitmap, row):
+        if bitmap is None:
+            return True
+        i = self._vector_id(row)
+        return bool(bitmap[i >> 3] >> (i & 7) & 1)
+
+    def _current_version(self):
+        paths = [self.index_file, self.metadata_path]
+        if self._vector_ids is not None:
+            paths.append(ids_path(self.index_file))
+        if self.lexical is not None and os.path.exists(bm25_path(self.index_file)):
+            paths.append(bm25_path(self.index_file))
+        # Backends differ in the last decimals, so don't share cached vectors
+        return f"{MODEL_NAME}:{config.encoder_backend}:{file_version(*paths)}"
+
+    def warm_up(self):
+        """Run one uncached encode and search (and rerank) so that lazy
+        initialisation in torch/ONNX and faiss is paid before real traffic."""
+        prompt = "warm-up query"
+        vector = np.asarray(self.model.encode([prompt], normalize_embeddings=True))
+        self.index.search(vector.astype(np.float32), 1)
+        if self.reranker is not None:
+            self.reranker.predict([(prompt, prompt)])
+
+    def lookup(self, question: str, top_k: int = 3, filters=(), rerank=False):
+        """Cached results for a query, or None. Cheap enough for the event loop."""
+        rerank = rerank and self.reranker is not None
+        return self.result_cache.get(
+            (self.version, normalize_prompt(question), top_k, filters, rerank),
+            record_miss=False,
+        )
+
+    def embed(self, texts: list[str]):
+        """Embed normalized prompts, encoding only those not cached yet."""
+        vectors = [self.embedding_cache.get((self.version, t)) for t in texts]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            encoded = self.model.encode(
+                [texts[i] for i in missing], normalize_embeddings=True
+            )
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                self.embedding_cache.set((self.version, texts[i]), vector)
+        return np.stack(vectors)
+
+    def query(self, question: str, top_k: int = 3, filters=(), rerank=False):
+        results, _ = self.query_batch([question], [top_k], filters, rerank)
+        return results[0]
+
+    def query_batch(
+        self,
+        questions: list[str],
+        top_ks: list[int],
+        filters=(),
+        rerank=False,
+        deadlines=None,
+    ):
+        """Answer several questions with one encode and one index search.
+
+        ``filters`` is a ``SearchFilters.key()`` tuple; only vectors in that
+        part of the code are scored. With ``rerank`` (and a reranker loaded)
+        candidates are re-ordered by the cross-encoder until the question's
+        ``time.monotonic()`` deadline, by default RERANK_BUDGET_MS from now.
+        Returns ``(results, timings)`` with milliseconds per stage.
+        """
+        start = time.perf_counter()
+        default_deadline = time.monotonic() + config.rerank_budget_ms / 1000
+        if deadlines is None:
+            deadlines = [None] * len(questions)
+        rerank = rerank and self.reranker is not None
+        prompts = [normalize_prompt(q) for q in questions]
+        keys = [(self.version, p, k, filters, rerank) for p, k in zip(prompts, top_ks)]
+        results = [self.result_cache.get(key) for key in keys]
+        missing = [i for i, r in enumerate(results) if r is None]
+        timings = {"cached": len(questions) - len(missing)}
+        if not missing:
+            return results, timings
+
+        bitmap = params = None
+        if filters:
+            selector = self._selector(filters)
+            if selector is None:
+                # No article can match, so don't encode or search at all
+                for i in missing:
+                    results[i] = []
+                return results, timings
+            bitmap, sel = selector
+            params = self._search_params(sel)
+
+        q_embeddings = self.embed([prompts[i] for i in missing])
+        encoded = time.perf_counter()
+        timings["encode_ms"] = (encoded - start) * 1000
+
+        fetch = {i: top_ks[i] * (config.rerank_candidates if rerank else 1) for i in missing}
+        k = max(fetch.values())
+        if self.lexical is not None:
+            k *= config.hybrid_candidates
+        if self.chunked:
+            # Several hits may be chunks of the same article
+            k *= config.chunk_candidates
+        D, I = self.index.search(q_embeddings, k, params=params)
+        I = self._rows(I)
+        scores = D if self.inner_product else 1 - D / 2
+        hits = {}
+        for i, rows, row_scores, q in zip(missing, I, scores, q_embeddings):
+            dense = self._aggregate(rows, row_scores)
+            # Hits are just ids and scores; render() adds the article text
+            hits[i] = [
+                {
+                    "id": row,
+                    "score": dense[row] if row in dense else self._similarity(row, q),
+                }
+                for row in self._fuse(prompts[i], list(dense), fetch[i], bitmap)
+            ]
+        searched = time.perf_counter()
+        timings["search_ms"] = (searched - encoded) * 1000
+
+        over_budget = set()
+        if rerank:
+            for i in missing:
+                reranked = self._rerank(
+                    questions[i], hits[i], deadlines[i] or default_deadline
+                )
+                if reranked is None:
+                    over_budget.add(i)
+                else:
+                    hits[i] = reranked
+            timings["rerank_ms"] = (time.perf_counter() - searched) * 1000
+            timings["rerank_skipped"] = len(over_budget)
+
+        for i in missing:
+            results[i] = hits[i][: top_ks[i]]
+            # Don't pin a fallback order; a quieter moment may rerank it
+            if i not in over_budget:
+                self.result_cache.set(keys[i], results[i])
+        return results, timings
+
+    def _rerank(self, question, hits, deadline=None):
+        """Re-order hits by cross-encoder relevance to the question.
+
+        Pairs are scored RERANK_BATCH_SIZE at a time; returns None if the
+        ``time.monotonic()`` deadline passes before they all are.
+        """
+        if not hits:
+            return hits
+        pairs = [
+            (
+                question,
+                self.metadata.field(hit["id"], "article_name")
+                + " "
+                + self.metadata.field(hit["id"], "content"),
+            )
+            for hit in hits
+        ]
+        size = config.rerank_batch_size
+        rerank_scores = []
+        for begin in range(0, len(pairs), size):
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            rerank_scores.extend(
+                self.reranker.predict(pairs[begin : begin + size], batch_size=size)
+            )
+        reranked = [
+            {**hit, "rerank_score": float(score)}
+            for hit, score in zip(hits, rerank_scores)
+        ]
+        reranked.sort(key=lambda hit: hit["rerank_score"], reverse=True)
+        return reranked
+
+    def _fuse(self, prompt, dense_rows, top_k, bitmap=None):
+        """Merge dense and BM25 rankings by reciprocal-rank fusion."""
+        if self.lexical is None:
+            return dense_rows[:top_k]
+        # BM25 has no selector, so over-fetch and drop rows outside the filter
+        lexical = [
+            row
+            for row, _ in self.lexical.search(
+                prompt, max(len(dense_rows), top_k) * (2 if bitmap is not None else 1)
+            )
+            if self._allowed(bitmap, row)
+        ]
+        fused = {}
+        for ranking in (dense_rows, lexical):
+            for rank, row in enumerate(ranking):
+                fused[row] = fused.get(row, 0.0) + 1 / (config.rrf_k + rank + 1)
+        exact = [
+            row for row in self.lexical.article_rows(prompt) if self._allowed(bitmap, row)
+        ]
+        ranked = sorted(fused, key=fused.get, reverse=True)
+        return (exact + [row for row in ranked if row not in exact])[:top_k]
+
+    @staticmethod
+    def _aggregate(rows, scores):
+        """``{row: score}``, best first, from hits that may be several chunks
+        of one article. An article scores as its best chunk, or with
+        CHUNK_AGGREGATION=sum as the sum of its chunks that were hit."""
+        dense = {}
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            # FAISS pads with -1 when the index holds fewer than k vectors
+            if row < 0:
+                continue
+            if row not in dense:
+                dense[row] = score  # hits come best first, so this is the max
+            elif config.chunk_aggregation == "sum":
+                dense[row] += score
+        if config.chunk_aggregation == "sum":
+            dense = dict(sorted(dense.items(), key=lambda item: item[1], reverse=True))
+        return dense
+
+    def _similarity(self, row, q_embedding):
+        """Cosine score for a hit the dense search did not return."""
+        try:
+            scores = [
+                float(self.index.reconstruct(i) @ q_embedding)
+                for i in self._chunk_ids(row)
+            ]
+        except RuntimeError:
+            return None
+        return sum(scores) if config.chunk_aggregation == "sum" else max(scores)
+
+    @staticmethod
+    def above(results, min_score):
+        """Drop hits scoring below ``min_score`` (cosine similarity).
+
+        Lexical hits whose vector cannot be reconstructed have no score and
+        are kept, since they matched the prompt's terms.
+        """
+        if min_score is None:
+            return results
+        return [
+            hit for hit in results if hit["score"] is None or hit["score"] >= min_score
+        ]
+
+    def _render_hit(self, hit):
+        fragment = self._fragments[hit["id"]]
+        tail = orjson.dumps(hit)[1:]
+        return fragment + (b"," if len(fragment) > 1 else b"") + tail
+
+    def project(self, hit, fields=None, snippet_chars=None):
+        """A hit as a dict with only ``fields`` and ``content`` cut short."""
+        if fields is None:
+            fields = self.metadata.fields
+        record = {
+            name: self.metadata.field(hit["id"], name)
+            for name in fields
+            if name in self.metadata.fields
+        }
+        content = record.get("content")
+        if snippet_chars is not None and content and len(content) > snippet_chars:
+            cut = content[:snippet_chars]
+            record["content"] = (cut.rsplit(" ", 1)[0] or cut) + "…"
+        record.update(hit)
+        return record
+
+    def render(self, hits, fields=None, snippet_chars=None) -> bytes:
+        """JSON array of full article records for ``hits``.
+
+        Full records are spliced together from JSON fragments encoded when the
+        engine loads, so static article text is not re-encoded on every request.
+        """
+        if fields is None and snippet_chars is None:
+            return b"[" + b",".join(self._render_hit(hit) for hit in hits) + b"]"
+        return orjson.dumps(
+            [self.project(hit, fields, snippet_chars) for hit in hits]
+        )
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "index_type": self.index_type,
+            "encoder": config.encoder_backend,
+            "vectors": self.index.ntotal,
+            "reranker": (
+                config.rerank_model_path or config.rerank_model
+                if self.reranker is not None
+                else None
+            ),
+            "embedding_cache": self.embedding_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+        }
@@ -1,6 +1,18 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, func
-from pydantic import BaseModel
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    UniqueConstraint,
+    func,
+)
+from pydantic import BaseModel, Field
+from typing import Optional
 from src.database import Base
+from src import config
 
 
 class AdminUser(Base):
@@ -14,6 +26,10 @@ class APIKey(Base):
     key = Column(String, unique=True, index=True, nullable=False)
     owner = Column(String, nullable=False)
     active = Column(Boolean, default=True, nullable=False)
+    # Throttling; NULL falls back to the defaults in src/config.py, 0 = unlimited
+    rate_limit_per_minute = Column(Integer, nullable=True)
+    burst = Column(Integer, nullable=True)
+    daily_quota = Column(Integer, nullable=True)
 
 
 class UsageLog(Base):
@@ -21,6 +37,29 @@ class UsageLog(Base):
     endpoint = Column(String)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_usagelog_api_key_id_timestamp", "api_key_id", "timestamp"),
+        # Serves the per-key /usage listing, which pages by id
+        Index("ix_usagelog_api_key_id_id", "api_key_id", "id"),
+    )
+
+
+class UsageRollup(Base):
+    """Requests per key, endpoint and hour, kept up to date from UsageLog."""
+
+    api_key_id = Column(Integer, ForeignKey("apikey.id"), nullable=False)
+    endpoint = Column(String, nullable=False)
+    bucket = Column(DateTime(timezone=True), nullable=False, index=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (UniqueConstraint("api_key_id", "endpoint", "bucket"),)
+
+
+class UsageRollupState(Base):
+    """Single row (id 1): the last UsageLog id folded into UsageRollup."""
+
+    last_usage_log_id = Column(Integer, nullable=False, default=0)
+
 
 class FaissMetadata(Base):
     faiss_id = Column(String, unique=True, index=True)
@@ -32,6 +71,62 @@ class FaissMetadata(Base):
 
 
 # pydantic model
+class SearchFilters(BaseModel):
+    """Restrict a search to part of the code, e.g. ``{"book": "V"}``.
+
+    Values are the roman (or, for sections, arabic) numerals of the metadata.
+    Chapter and section numbers restart in each book/title, so they are
+    usually combined with the levels above them.
+    """
+
+    book: Optional[str] = None
+    title: Optional[str] = None
+    chapter: Optional[str] = None
+    section: Optional[str] = None
+
+    def key(self) -> tuple:
+        """Hashable ``((metadata_field, value), ...)`` form used by the engine."""
+        fields = {
+            "book": "book_roman",
+            "title": "title_roman",
+            "chapter": "chapter_roman",
+            "section": "section_roman_or_arabic",
+        }
+        return tuple(
+            (fields[name], value.strip().upper())
+            for name, value in self.model_dump().items()
+            if value
+        )
+
+
 class ChatRequest(BaseModel):
     prompt: str
-    top_k: int = 3
+    top_k: int = Field(default=3, ge=1, le=config.max_top_k)
+    # Only return hits at least this similar (cosine, -1 to 1) to the prompt
+    min_score: Optional[float] = None
+    filters: Optional[SearchFilters] = None
+    # Send a text/event-stream: "start", one "result" per hit, then "done"
+    stream: bool = False
+    # Only return these metadata fields ("id" and "score" are always sent)
+    fields: Optional[list[str]] = None
+    # Cut each article's content to about this many characters
+    snippet_chars: Optional[int] = Field(default=None, ge=0)
+    # Re-order candidates with the cross-encoder (if the server enables it)
+    rerank: bool = False
+
+
+class BatchPrompt(BaseModel):
+    prompt: str
+    top_k: int = Field(default=3, ge=1, le=config.max_top_k)
+    min_score: Optional[float] = None
+
+
+class BatchChatRequest(BaseModel):
+    prompts: list[BatchPrompt] = Field(max_length=config.max_batch_prompts)
+    # Applied to every prompt in the batch
+    filters: Optional[SearchFilters] = None
+    fields: Optional[list[str]] = None
+    snippet_chars: Optional[int] = Field(default=None, ge=0)
+    rerank: bool = False
+    # Stream one NDJSON line per prompt instead of a single JSON body
+    stream: bool = False
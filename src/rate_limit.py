@@ -0,0 +1,137 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+
+from src import config
+
+
+class MemoryBackend:
+    """Token buckets and daily counters kept in this process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._daily = {}
+
+    async def take(self, key, rate, burst, now, cost=1):
+        """Take ``cost`` tokens; return 0, or the seconds until they are available.
+
+        A cost above ``burst`` is let through on a full bucket and leaves it
+        in debt, so the key still pays for it before its next request.
+        """
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        needed = min(cost, burst)
+        wait = 0.0
+        if tokens >= needed:
+            tokens -= cost
+        else:
+            wait = (needed - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        return wait
+
+    async def count(self, key, day, cost=1):
+        """Count ``cost`` requests against ``key`` for ``day``; return the total."""
+        current_day, total = self._daily.get(key, (day, 0))
+        if current_day != day:
+            total = 0
+        self._daily[key] = (day, total + cost)
+        return total + cost
+
+
+class RedisBackend:
+    """Same interface as MemoryBackend, shared by all workers through Redis.
+
+    Needs the optional ``redis`` package.
+    """
+
+    TAKE_SCRIPT = """
+    local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local needed = math.min(cost, burst)
+    local wait = 0
+    if tokens >= needed then tokens = tokens - cost else wait = (needed - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil((burst + cost) / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis://... needs `pip install redis`")
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(self.TAKE_SCRIPT)
+
+    async def take(self, key, rate, burst, now, cost=1):
+        return float(
+            await self._take(keys=[f"ratelimit:{key}"], args=[rate, burst, now, cost])
+        )
+
+    async def count(self, key, day, cost=1):
+        name = f"quota:{key}:{day}"
+        async with self._redis.pipeline() as pipe:
+            total, _ = await pipe.incrby(name, cost).expire(name, 2 * 86400).execute()
+        return total
+
+
+def make_backend(url):
+    if url == "memory":
+        return MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {url}")
+
+
+class RateLimiter:
+    """Per-key token bucket plus a daily quota (UTC days).
+
+    A request costs one token and counts once against the quota, except
+    where the route charges more, e.g. one per prompt of a batch.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.rejected = 0
+
+    async def check(self, api_key, cost=1):
+        per_minute = api_key.rate_limit_per_minute
+        if per_minute is None:
+            per_minute = config.default_rate_limit_per_minute
+        if per_minute > 0:
+            burst = api_key.burst or per_minute
+            wait = await self.backend.take(
+                api_key.id, per_minute / 60, burst, time.time(), cost
+            )
+            if wait > 0:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Rate limit exceeded",
+                    headers={"Retry-After": str(max(1, round(wait)))},
+                )
+
+        quota = api_key.daily_quota
+        if quota is None:
+            quota = config.default_daily_quota
+        if quota > 0:
+            now = datetime.now(timezone.utc)
+            total = await self.backend.count(api_key.id, now.date().isoformat(), cost)
+            if total > quota:
+                self.rejected += 1
+                midnight = datetime.combine(
+                    now.date() + timedelta(days=1), datetime.min.time(), timezone.utc
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Daily quota exceeded",
+                    headers={"Retry-After": str(int((midnight - now).total_seconds()))},
+                )
+
+
+rate_limiter = RateLimiter(make_backend(config.rate_limit_backend))
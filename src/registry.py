@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+from src import config
+from src.index_files import file_version, ids_path
+
+logger = logging.getLogger(__name__)
+
+
+def build_engine(spec):
+    # Imported here so that importing the app doesn't pull in faiss, torch
+    # and transformers; only the code that actually builds an engine does.
+    from src.model_engine import FaissEngine
+
+    return FaissEngine(*spec)
+
+
+class IndexRegistry:
+    """The index/metadata versions the API can serve, and hot swaps between them.
+
+    Versions are listed in the INDEX_REGISTRY manifest, a JSON file like::
+
+        {"active": "2025-06",
+         "versions": {"2025-06": {"index_file": "...", "metadata_file": "..."}}}
+
+    Without a manifest there is one version, INDEX_FILE + METADATA_FILE, named
+    after a fingerprint of those files so a rebuild in place is a new version.
+
+    ``swap`` builds and warms up a new engine next to the active one and then
+    replaces ``app.state.faiss_engine``. Requests that already hold the old
+    engine finish on it, and it's freed once the last of them is done.
+    """
+
+    def __init__(self, manifest=None):
+        self.manifest = manifest
+        self.state = "idle"
+        self.error = None
+        self.history = []
+        self._lock = asyncio.Lock()
+        self._watch_task = None
+        self._swap_task = None
+        self._stop_watching = None
+
+    def _read_manifest(self):
+        with open(self.manifest, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def versions(self):
+        if not self.manifest:
+            index_file, metadata_file, name = self.resolve()
+            return {name: {"index_file": index_file, "metadata_file": metadata_file}}
+        return self._read_manifest()["versions"]
+
+    def resolve(self, version=None):
+        """``(index_file, metadata_file, name)`` of ``version`` or the active one."""
+        if not self.manifest:
+            paths = (config.index_file, config.metadata_file)
+            name = hashlib.sha1(file_version(*paths).encode()).hexdigest()[:12]
+            return (*paths, name)
+        manifest = self._read_manifest()
+        version = version or manifest["active"]
+        if version not in manifest["versions"]:
+            raise ValueError(f"Unknown index version: {version}")
+        entry = manifest["versions"][version]
+        return (entry["index_file"], entry["metadata_file"], version)
+
+    def activate(self, version):
+        """Point the manifest at ``version``; watching workers follow."""
+        manifest = self._read_manifest()
+        if version not in manifest["versions"]:
+            raise ValueError(f"Unknown index version: {version}")
+        manifest["active"] = version
+        tmp = self.manifest + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self.manifest)
+
+    async def swap(self, app, version=None, activate=False):
+        """Load ``version`` (default: the active one) and make it current.
+
+        With ``activate`` the manifest is pointed at ``version`` too, but only
+        once it has loaded and warmed up, so a broken version never becomes
+        the one watching workers follow.
+        """
+        async with self._lock:
+            self.state = "loading"
+            start = time.perf_counter()
+            try:
+                spec = self.resolve(version)
+                current = app.state.faiss_engine
+                if current is not None and current.spec == spec:
+                    if activate:
+                        self.activate(version)
+                    self.state = "idle"
+                    return current
+                engine = await asyncio.to_thread(build_engine, spec)
+                await app.state.inference.warm_up(engine)
+                if activate:
+                    self.activate(version)
+            except Exception as e:
+                logger.exception("Failed to load index version %s", version)
+                self.state = "failed"
+                self.error = f"{type(e).__name__}: {e}"
+                raise
+            app.state.faiss_engine = engine
+            self.state = "idle"
+            self.error = None
+            self.history.append(
+                {
+                    "version": engine.name,
+                    "previous": current.name if current is not None else None,
+                    "load_ms": (time.perf_counter() - start) * 1000,
+                    "swapped_at": time.time(),
+                }
+            )
+            del self.history[:-10]
+            logger.info("Now serving index version %s", engine.name)
+            return engine
+
+    def start_swap(self, app, version=None, activate=False):
+        """``swap`` in the background; the outcome shows up in ``stats``."""
+        self._swap_task = asyncio.create_task(
+            self._swap_quietly(app, version, activate)
+        )
+
+    async def _swap_quietly(self, app, version=None, activate=False):
+        try:
+            await self.swap(app, version, activate)
+        except Exception:
+            pass  # logged in swap; the old version keeps serving
+
+    def _watched_files(self):
+        if self.manifest:
+            return {self.manifest}
+        from src.lexical import bm25_path
+        from src.metadata_store import store_path
+
+        index_file, metadata_file, _ = self.resolve()
+        return {
+            index_file,
+            metadata_file,
+            store_path(metadata_file),
+            bm25_path(index_file),
+            ids_path(index_file),
+        }
+
+    def start_watching(self, app):
+        if config.index_watch:
+            self._stop_watching = asyncio.Event()
+            self._watch_task = asyncio.create_task(self._watch(app))
+
+    async def _watch(self, app):
+        try:
+            from watchfiles import awatch
+
+            watched = {os.path.abspath(p) for p in self._watched_files()}
+            # Writers replace files via renames, so watch the directories
+            directories = {os.path.dirname(p) for p in watched}
+            # The debounce lets a multi-file rebuild finish before we reload
+            async for changes in awatch(
+                *directories,
+                debounce=config.index_watch_debounce_ms,
+                stop_event=self._stop_watching,
+            ):
+                if watched & {os.path.abspath(path) for _, path in changes}:
+                    await self._swap_quietly(app)
+        except Exception:
+            logger.exception("Stopped watching index files")
+
+    async def stop(self):
+        # awatch notices this between polls; cancelling it instead would
+        # leave its watcher thread running into interpreter shutdown
+        if self._stop_watching is not None:
+            self._stop_watching.set()
+            await asyncio.wait([self._watch_task], timeout=5)
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "error": self.error,
+            "versions": self.versions(),
+            "history": self.history,
+        }
+
+
+index_registry = IndexRegistry(config.index_registry or None)
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import func, literal_column
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from src.models import APIKey, UsageLog, AdminUser
-from src.database import get_db
+from src.models import APIKey, UsageLog, UsageRollup, AdminUser
+from src.database import get_db, pool_stats
 from src.auth import (
+    api_key_cache,
     get_current_admin,
-    get_password_hash,
+    get_password_hash_async,
     create_access_token,
-    verify_password,
+    verify_password_async,
 )
+from src.rate_limit import rate_limiter
+from src.registry import index_registry
+from src.usage import refresh_usage_rollup, usage_writer
+from datetime import datetime
+from typing import Literal, Optional
 import secrets
 
 
@@ -19,7 +26,7 @@ router = APIRouter(prefix="/admin")
 async def login(username: str, password: str, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(AdminUser).where(AdminUser.username == username))
     admin = result.scalar_one_or_none()
-    if not admin or not verify_password(password, admin.hashed_password):
+    if not admin or not await verify_password_async(password, admin.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_access_token({"sub": admin.username})
     return {"access_token": token, "token_type": "bearer"}
@@ -35,7 +42,7 @@ async def create_admin_user(
     if not current_admin.is_superadmin:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    hashed_pw = get_password_hash(password)
+    hashed_pw = await get_password_hash_async(password)
     user = AdminUser(username=username, hashed_password=hashed_pw)
     db.add(user)
     await db.commit()
@@ -45,11 +52,20 @@ async def create_admin_user(
 @router.post("/keys/create")
 async def create_key(
     owner: str,
+    rate_limit_per_minute: Optional[int] = None,
+    burst: Optional[int] = None,
+    daily_quota: Optional[int] = None,
     db: AsyncSession = Depends(get_db),
     current_admin: AdminUser = Depends(get_current_admin),
 ):
     key = secrets.token_hex(16)
-    api_key = APIKey(key=key, owner=owner)
+    api_key = APIKey(
+        key=key,
+        owner=owner,
+        rate_limit_per_minute=rate_limit_per_minute,
+        burst=burst,
+        daily_quota=daily_quota,
+    )
     db.add(api_key)
     await db.commit()
     return {"key": key}
@@ -67,22 +83,157 @@ async def deactivate_key(
         raise HTTPException(status_code=404, detail="API Key not found")
     api_key.active = False
     await db.commit()
+    api_key_cache.pop(key)
     return {"message": "API key deactivated"}
 
 
+@router.post("/keys/limits")
+async def set_key_limits(
+    key: str,
+    rate_limit_per_minute: Optional[int] = None,
+    burst: Optional[int] = None,
+    daily_quota: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_admin: AdminUser = Depends(get_current_admin),
+):
+    """Set a key's limits; omitted ones go back to the defaults, 0 = unlimited."""
+    result = await db.execute(select(APIKey).where(APIKey.key == key))
+    api_key = result.scalar_one_or_none()
+    if not api_key:
+        raise HTTPException(status_code=404, detail="API Key not found")
+    api_key.rate_limit_per_minute = rate_limit_per_minute
+    api_key.burst = burst
+    api_key.daily_quota = daily_quota
+    await db.commit()
+    api_key_cache.pop(key)
+    return {"message": "API key limits updated"}
+
+
 @router.get("/keys")
 async def list_keys(
+    after_id: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
     db: AsyncSession = Depends(get_db),
     current_admin: AdminUser = Depends(get_current_admin),
 ):
-    result = await db.execute(select(APIKey))
-    return result.scalars().all()
+    """Keys in id order; pass ``next_after_id`` back to get the next page."""
+    result = await db.execute(
+        select(APIKey).where(APIKey.id > after_id).order_by(APIKey.id).limit(limit)
+    )
+    keys = result.scalars().all()
+    return {
+        "items": keys,
+        "next_after_id": keys[-1].id if len(keys) == limit else None,
+    }
 
 
 @router.get("/usage")
 async def usage(
+    before_id: Optional[int] = None,
+    api_key_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    current_admin: AdminUser = Depends(get_current_admin),
+):
+    """Raw usage rows, newest first; pass ``next_before_id`` for older ones."""
+    query = select(UsageLog).order_by(UsageLog.id.desc()).limit(limit)
+    if before_id is not None:
+        query = query.where(UsageLog.id < before_id)
+    if api_key_id is not None:
+        query = query.where(UsageLog.api_key_id == api_key_id)
+    result = await db.execute(query)
+    logs = result.scalars().all()
+    return {
+        "items": logs,
+        "next_before_id": logs[-1].id if len(logs) == limit else None,
+    }
+
+
+@router.get("/usage/summary")
+async def usage_summary(
+    granularity: Literal["hour", "day"] = "day",
+    api_key_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
     db: AsyncSession = Depends(get_db),
     current_admin: AdminUser = Depends(get_current_admin),
 ):
-    result = await db.execute(select(UsageLog))
-    return result.scalars().all()
+    """Requests per key per hour or day, aggregated in SQL from the rollup."""
+    await refresh_usage_rollup(db)
+    # granularity is validated above, so it is safe to inline
+    bucket = func.date_trunc(
+        literal_column(f"'{granularity}'"), UsageRollup.bucket
+    ).label("bucket")
+    query = (
+        select(
+            UsageRollup.api_key_id,
+            bucket,
+            func.sum(UsageRollup.count).label("requests"),
+        )
+        .group_by(UsageRollup.api_key_id, bucket)
+        .order_by(bucket.desc(), UsageRollup.api_key_id)
+        .limit(limit)
+    )
+    if api_key_id is not None:
+        query = query.where(UsageRollup.api_key_id == api_key_id)
+    if since is not None:
+        query = query.where(UsageRollup.bucket >= since)
+    if until is not None:
+        query = query.where(UsageRollup.bucket < until)
+    result = await db.execute(query)
+    return [
+        {"api_key_id": row.api_key_id, "bucket": row.bucket, "requests": row.requests}
+        for row in result
+    ]
+
+
+@router.get("/index")
+async def index_versions(
+    request: Request,
+    current_admin: AdminUser = Depends(get_current_admin),
+):
+    engine = request.app.state.faiss_engine
+    return {"active": engine.name if engine else None, **index_registry.stats()}
+
+
+@router.post("/index/reload", status_code=202)
+async def reload_index(
+    request: Request,
+    version: Optional[str] = None,
+    current_admin: AdminUser = Depends(get_current_admin),
+):
+    """Load ``version`` (default: the active one, re-read from disk) in the
+    background and swap it in. Once it is serving, the registry manifest is
+    pointed at it too, so workers watching it (INDEX_WATCH=1) follow."""
+    if index_registry.state == "loading":
+        raise HTTPException(status_code=409, detail="An index reload is running")
+    if version and not index_registry.manifest:
+        raise HTTPException(
+            status_code=400,
+            detail="Index versions need a registry manifest (INDEX_REGISTRY)",
+        )
+    try:
+        index_registry.resolve(version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    index_registry.start_swap(request.app, version, activate=bool(version))
+    return {"message": "Index reload started", "version": version}
+
+
+@router.get("/stats")
+async def stats(
+    request: Request,
+    current_admin: AdminUser = Depends(get_current_admin),
+):
+    state = request.app.state
+    return {
+        "startup": state.engine_loader.stats(),
+        "engine": state.faiss_engine.stats() if state.faiss_engine else None,
+        "inference": state.inference.stats(),
+        "batching": state.batcher.stats(),
+        "usage_log": usage_writer.stats(),
+        "api_key_cache": api_key_cache.stats(),
+        "rate_limited": rate_limiter.rejected,
+        "db_pool": pool_stats(),
+    }
@@ -1,22 +1,165 @@
+import time
+
+import orjson
 from fastapi import APIRouter, Depends, Request
 from fastapi.exceptions import HTTPException
-from src.models import ChatRequest
-from src.auth import verify_api_key
+from fastapi.responses import Response, StreamingResponse
+from src.models import ChatRequest, BatchChatRequest
+from src.auth import get_api_key, throttle
 from src import config
 
 
 chat_router = APIRouter(prefix="/chat")
 
 
-@chat_router.post("/completions")
-async def chat(req: ChatRequest, request: Request, api_key=Depends(verify_api_key)):
+def sse(event, data: bytes):
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+
+def json_response(content: bytes, headers=None):
+    # The body is already JSON bytes, so skip FastAPI's encoder entirely
+    return Response(content, media_type="application/json", headers=headers)
+
+
+def rerank_deadline(request: Request):
+    """When re-ranking must stop: RERANK_BUDGET_MS after the request arrived."""
+    received = getattr(request.state, "received", None) or time.monotonic()
+    return received + config.rerank_budget_ms / 1000
+
+
+# Endpoint names in the usage log. Usage has always been grouped under the
+# chat one, which predates the /api prefix, so it stays as it was.
+CHAT_USAGE = "/v1/chat/completions"
+BATCH_USAGE = "/v1/chat/completions/batch"
+
+
+def ready_engine(request: Request):
+    """The engine serving searches, or a 503 while it is still loading."""
     engine = request.app.state.faiss_engine
     if not engine:
-        return HTTPException(status_code=503, detail="FAISS engine not initialized")
-    max_top_k = getattr(config, "max_top_k", 3)
+        raise HTTPException(
+            status_code=503,
+            detail="FAISS engine not initialized",
+            headers={"Retry-After": "5"},
+        )
+    return engine
+
+
+def version_headers(engine):
+    # Which index answered; it can change between requests on a hot swap
+    return {"X-Index-Version": engine.name}
+
+
+@chat_router.post("/completions")
+async def chat(req: ChatRequest, request: Request, api_key=Depends(get_api_key)):
+    # Only requests that will be served are charged
+    engine = ready_engine(request)
+    await throttle(api_key, CHAT_USAGE)
+    filters = req.filters.key() if req.filters else ()
+    deadline = rerank_deadline(request)
+
+    async def search():
+        result = engine.lookup(req.prompt, req.top_k, filters, req.rerank)
+        timings = {"cached": 1}
+        if result is None:
+            result, timings = await request.app.state.batcher.query(
+                engine, req.prompt, req.top_k, filters, req.rerank, deadline=deadline
+            )
+        return engine.above(result, req.min_score), timings
+
+    def render(hits):
+        return engine.render(hits, req.fields, req.snippet_chars)
+
+    if not req.stream:
+        result, timings = await search()
+        return json_response(
+            b'{"results":%s,"timings":%s,"index_version":%s}'
+            % (render(result), orjson.dumps(timings), orjson.dumps(engine.name)),
+            version_headers(engine),
+        )
+
+    async def events():
+        # Sent before any search work so clients know the request was accepted
+        yield sse(
+            "start", orjson.dumps({"top_k": req.top_k, "index_version": engine.name})
+        )
+        try:
+            result, timings = await search()
+        except HTTPException as e:
+            # Headers are already sent, so report the failure in-band
+            error = {"status": e.status_code, "detail": e.detail}
+            yield sse("error", orjson.dumps(error))
+            return
+        for rank, hit in enumerate(result):
+            data = b'{"rank":%d,"result":%s}' % (rank, render([hit])[1:-1])
+            yield sse("result", data)
+        yield sse("done", orjson.dumps({"count": len(result), "timings": timings}))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop proxies (nginx) from buffering the stream
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            **version_headers(engine),
+        },
+    )
+
+
+@chat_router.post("/completions/batch")
+async def chat_batch(
+    req: BatchChatRequest, request: Request, api_key=Depends(get_api_key)
+):
+    engine = ready_engine(request)
+    # Every prompt is a search, so it costs what a single request does
+    await throttle(api_key, BATCH_USAGE, cost=max(1, len(req.prompts)))
+
+    inference = request.app.state.inference
+    chunk_size = config.batch_chunk_size
+    filters = req.filters.key() if req.filters else ()
+    # One budget for the whole batch, so later chunks fall back to the
+    # bi-encoder order rather than each getting a fresh one
+    deadline = rerank_deadline(request)
+    # Milliseconds per stage, summed over the chunks
+    timings = {}
+
+    async def search_chunks():
+        for start in range(0, len(req.prompts), chunk_size):
+            chunk = req.prompts[start : start + chunk_size]
+            results, chunk_timings = await inference.run(
+                engine,
+                "query_batch",
+                [item.prompt for item in chunk],
+                [item.top_k for item in chunk],
+                filters,
+                req.rerank,
+                [deadline] * len(chunk),
+            )
+            for stage, value in chunk_timings.items():
+                timings[stage] = timings.get(stage, 0) + value
+            for index, (item, result) in enumerate(zip(chunk, results), start):
+                yield index, engine.above(result, item.min_score)
+
+    def render(hits):
+        return engine.render(hits, req.fields, req.snippet_chars)
+
+    if not req.stream:
+        results = [render(result) async for _, result in search_chunks()]
+        return json_response(
+            b'{"results":[%s],"timings":%s,"index_version":%s}'
+            % (b",".join(results), orjson.dumps(timings), orjson.dumps(engine.name)),
+            version_headers(engine),
+        )
 
-    if req.top_k > max_top_k:
-        return {"error": f"top_k cannot be greater than {max_top_k}"}
+    async def ndjson():
+        try:
+            async for index, result in search_chunks():
+                yield b'{"index":%d,"results":%s}\n' % (index, render(result))
+        except HTTPException as e:
+            # Headers are already sent, so report the failure in-band
+            yield orjson.dumps({"error": e.detail}) + b"\n"
 
-    result = engine.query(req.prompt, req.top_k)
-    return {"results": result}
+    return StreamingResponse(
+        ndjson(), media_type="application/x-ndjson", headers=version_headers(engine)
+    )
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+health_router = APIRouter()
+
+
+@health_router.get("/healthz")
+async def healthz(request: Request):
+    """Liveness: the worker is serving. Fails only if the engine can't load."""
+    loader = request.app.state.engine_loader
+    status_code = 503 if loader.state == "failed" else 200
+    return JSONResponse(loader.stats(), status_code=status_code)
+
+
+@health_router.get("/readyz")
+async def readyz(request: Request):
+    """Readiness: the engine is loaded and warmed up, so send traffic."""
+    loader = request.app.state.engine_loader
+    status_code = 200 if loader.ready else 503
+    return JSONResponse(loader.stats(), status_code=status_code)
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+
+from src.registry import build_engine, index_registry
+
+logger = logging.getLogger(__name__)
+
+
+class EngineLoader:
+    """Builds and warms up the first FaissEngine in the background.
+
+    The app starts serving straight away; ``app.state.faiss_engine`` stays
+    None (chat requests get a 503) until the engine is loaded and a warm-up
+    query has gone through the inference pool. ``state`` moves through
+    loading -> warming -> ready, or ends in failed, and is what /readyz
+    reports.
+    """
+
+    def __init__(self):
+        self.state = "loading"
+        self.error = None
+        self.timings = {}
+        self._started = time.monotonic()
+        self._task = None
+
+    def start(self, app, engine=None):
+        self._task = asyncio.create_task(self._load(app, engine))
+
+    async def _load(self, app, engine):
+        try:
+            if engine is None:
+                start = time.perf_counter()
+                engine = await asyncio.to_thread(
+                    build_engine, index_registry.resolve()
+                )
+                self.timings["load_ms"] = (time.perf_counter() - start) * 1000
+            self.state = "warming"
+            start = time.perf_counter()
+            await app.state.inference.warm_up(engine)
+            self.timings["warm_up_ms"] = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            logger.exception("Failed to load the FAISS engine")
+            self.state = "failed"
+            self.error = f"{type(e).__name__}: {e}"
+            return
+        app.state.faiss_engine = engine
+        # Later versions are swapped in by the registry
+        index_registry.start_watching(app)
+        self.state = "ready"
+        self.timings["ready_after_s"] = time.monotonic() - self._started
+        logger.info("FAISS engine ready: %s", self.timings)
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def stop(self):
+        # A load still running in its thread finishes there, unobserved
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "error": self.error,
+            "uptime_s": time.monotonic() - self._started,
+            "timings": self.timings,
+        }
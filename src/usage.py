@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src import config
+from src.database import AsyncSessionLocal
+from src.models import UsageLog, UsageRollup, UsageRollupState
+
+logger = logging.getLogger(__name__)
+
+
+class UsageLogWriter:
+    """Buffers UsageLog rows and writes them with bulk inserts.
+
+    Requests only append to an in-memory list; a background task flushes it
+    every ``flush_interval`` seconds or as soon as ``flush_size`` rows are
+    waiting. If the database is unreachable rows are kept for retry, up to
+    ten flushes' worth, after which the oldest are dropped.
+    """
+
+    def __init__(self, session_factory, flush_interval=2.0, flush_size=500):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_buffer = flush_size * 10
+        self._buffer = []
+        self._wake = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+
+    def log(self, api_key_id, endpoint):
+        self._buffer.append(
+            {
+                "api_key_id": api_key_id,
+                "endpoint": endpoint,
+                # Stamp the request time, not the time the row is flushed
+                "timestamp": datetime.now(timezone.utc),
+            }
+        )
+        if len(self._buffer) >= self.flush_size:
+            self._wake.set()
+
+    async def flush(self):
+        rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        try:
+            async with self.session_factory() as db:
+                await db.execute(insert(UsageLog), rows)
+                await db.commit()
+            self.written += len(rows)
+        except Exception:
+            logger.exception("Failed to write %d usage log rows", len(rows))
+            self._buffer = rows + self._buffer
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.dropped += overflow
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and write whatever is still buffered."""
+        # Let an in-flight flush finish rather than cancelling it mid-insert
+        self._stopping = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+usage_writer = UsageLogWriter(
+    AsyncSessionLocal,
+    flush_interval=config.usage_flush_interval,
+    flush_size=config.usage_flush_size,
+)
+
+
+# Rows inserted less than this long ago are left for the next refresh, so a
+# flush whose transaction is still open when the watermark moves isn't
+# skipped. Measured on created_at, the insert time: a row re-buffered after a
+# failed flush keeps its old request timestamp.
+ROLLUP_LAG = timedelta(minutes=1)
+
+
+async def refresh_usage_rollup(db):
+    """Fold new UsageLog rows into the hourly UsageRollup table.
+
+    UsageRollupState keeps the last UsageLog id already counted, so each
+    refresh reads only the rows after it, a primary-key range scan, and
+    adds their counts to the buckets. Locking the state row serialises
+    concurrent refreshes.
+    """
+    # The migration seeds the state row; recreate it if it is missing so
+    # there is always a row for the lock below to hold
+    await db.execute(
+        pg_insert(UsageRollupState)
+        .values(id=1, last_usage_log_id=0)
+        .on_conflict_do_nothing(index_elements=["id"])
+    )
+    last = await db.scalar(
+        select(UsageRollupState.last_usage_log_id)
+        .where(UsageRollupState.id == 1)
+        .with_for_update()
+    )
+    upper = await db.scalar(
+        select(func.max(UsageLog.id)).where(
+            UsageLog.id > last, UsageLog.created_at < func.now() - ROLLUP_LAG
+        )
+    )
+    if upper is None:
+        await db.commit()
+        return
+
+    # Inlined so SELECT and GROUP BY render the identical expression
+    hour = func.date_trunc(literal_column("'hour'"), UsageLog.timestamp)
+    counts = (
+        select(UsageLog.api_key_id, UsageLog.endpoint, hour, func.count(UsageLog.id))
+        .where(
+            UsageLog.id > last,
+            UsageLog.id <= upper,
+            UsageLog.api_key_id.is_not(None),
+            UsageLog.endpoint.is_not(None),
+        )
+        .group_by(UsageLog.api_key_id, UsageLog.endpoint, hour)
+    )
+    stmt = pg_insert(UsageRollup).from_select(
+        ["api_key_id", "endpoint", "bucket", "count"], counts
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["api_key_id", "endpoint", "bucket"],
+        set_={
+            "count": UsageRollup.count + stmt.excluded.count,
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
+
+    await db.execute(
+        update(UsageRollupState)
+        .where(UsageRollupState.id == 1)
+        .values(last_usage_log_id=upper, updated_at=func.now())
+    )
+    await db.commit()
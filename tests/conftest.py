@@ -0,0 +1,198 @@
+import hashlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+# The trainer scripts import each other as top-level modules
+for path in (ROOT, ROOT / "trainer"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# src.config and src.database read the environment on import
+_tmp = tempfile.mkdtemp(prefix="criminal-code-tests-")
+DB_FILE = os.path.join(_tmp, "test.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_FILE}"
+os.environ["DEFAULT_RATE_LIMIT_PER_MINUTE"] = "0"
+os.environ["USAGE_FLUSH_INTERVAL"] = "0.05"
+
+CORPUS_FILE = ROOT / "trainer" / "corpus-v2-out.json"
+DIMENSION = 32
+
+
+def fake_vector(text):
+    """A unit vector fixed by the text, so equal texts score 1.0. Uncased,
+    like MiniLM, so normalized prompts still match the text they came from."""
+    text = " ".join(text.split()).lower()
+    seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+    vector = np.random.default_rng(seed).standard_normal(DIMENSION)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+class FakeEncoder:
+    """Stands in for SentenceTransformer: no download, deterministic."""
+
+    calls = []
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        FakeEncoder.calls.append(list(texts))
+        return np.stack([fake_vector(t) for t in texts]).reshape(-1, DIMENSION)
+
+
+class FakeCrossEncoder:
+    """Scores a pair by how many of the question's words the text contains."""
+
+    calls = []
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def predict(self, pairs, batch_size=32, **kwargs):
+        FakeCrossEncoder.calls.append(len(pairs))
+        return np.array(
+            [
+                float(sum(word in text.lower() for word in question.lower().split()))
+                for question, text in pairs
+            ]
+        )
+
+
+@pytest.fixture(autouse=True)
+def fake_models(monkeypatch):
+    import sentence_transformers
+
+    monkeypatch.setattr(sentence_transformers, "SentenceTransformer", FakeEncoder)
+    monkeypatch.setattr(sentence_transformers, "CrossEncoder", FakeCrossEncoder)
+    for module in ("embed_index", "pipeline", "benchmark_index"):
+        if module in sys.modules:
+            monkeypatch.setattr(sys.modules[module], "SentenceTransformer", FakeEncoder)
+    FakeEncoder.calls = []
+    FakeCrossEncoder.calls = []
+
+
+def load_docs():
+    import json
+
+    with open(CORPUS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def docs():
+    return load_docs()
+
+
+def build(directory, docs, index_type="flat", **kwargs):
+    """Index ``docs`` with the fake encoder; returns (index, metadata) paths."""
+    import json
+
+    import embed_index
+
+    corpus = os.path.join(directory, "corpus.json")
+    with open(corpus, "w", encoding="utf-8") as f:
+        json.dump(docs, f)
+    index_file = os.path.join(directory, f"{index_type}.index")
+    metadata_file = os.path.join(directory, f"{index_type}.json")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(embed_index, "SentenceTransformer", FakeEncoder)
+        embed_index.index_corpus(corpus, index_file, metadata_file, index_type, **kwargs)
+    return index_file, metadata_file
+
+
+@pytest.fixture(scope="session")
+def built_index(tmp_path_factory, docs):
+    return build(str(tmp_path_factory.mktemp("index")), docs)
+
+
+@pytest.fixture(scope="session")
+def session_engine(built_index):
+    import sentence_transformers
+
+    from src.model_engine import FaissEngine
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(sentence_transformers, "SentenceTransformer", FakeEncoder)
+        return FaissEngine(*built_index)
+
+
+@pytest.fixture
+def engine(session_engine):
+    session_engine.embedding_cache.clear()
+    session_engine.result_cache.clear()
+    return session_engine
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Creates the tables and an API key "test-key"; returns its id."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from src.database import Base
+    from src.models import AdminUser, APIKey  # noqa: F401 (registers the tables)
+
+    sync_engine = create_engine(f"sqlite:///{DB_FILE}")
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        key = APIKey(key="test-key", owner="tests")
+        db.add(key)
+        db.commit()
+        key_id = key.id
+    sync_engine.dispose()
+    return key_id
+
+
+def add_api_key(key, **limits):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from src.models import APIKey
+
+    sync_engine = create_engine(f"sqlite:///{DB_FILE}")
+    with Session(sync_engine) as db:
+        api_key = APIKey(key=key, owner="tests", **limits)
+        db.add(api_key)
+        db.commit()
+        key_id = api_key.id
+    sync_engine.dispose()
+    return key_id
+
+
+@pytest.fixture(scope="session")
+def client(built_index, database):
+    """The app serving ``built_index``, shared so it keeps one event loop."""
+    import time
+
+    import sentence_transformers
+    from fastapi.testclient import TestClient
+
+    from src import config
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(sentence_transformers, "SentenceTransformer", FakeEncoder)
+        mp.setattr(config, "index_file", built_index[0])
+        mp.setattr(config, "metadata_file", built_index[1])
+        import main
+
+        with TestClient(main.app) as test_client:
+            for _ in range(200):
+                if test_client.get("/readyz").status_code == 200:
+                    break
+                time.sleep(0.05)
+            yield test_client
+
+
+def chat(client, body, key="test-key", path="/api/chat/completions"):
+    return client.post(path, params={"api_key": key}, json=body)
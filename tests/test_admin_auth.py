@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from src import auth
+
+
+def test_password_checks_run_on_the_bcrypt_threads(monkeypatch):
+    seen = []
+
+    def verify(plain, hashed):
+        seen.append(threading.current_thread().name)
+        return plain == hashed
+
+    monkeypatch.setattr(auth, "verify_password", verify)
+    assert asyncio.run(auth.verify_password_async("secret", "secret"))
+    assert seen[0].startswith("bcrypt")
+    assert seen[0] != threading.main_thread().name
+
+
+def test_hashes_verify():
+    hashed = asyncio.run(auth.get_password_hash_async("secret"))
+    assert auth.verify_password("secret", hashed)
+    assert not auth.verify_password("wrong", hashed)
+
+
+class OneShotSession:
+    """Answers one adminuser lookup; a second one fails the test."""
+
+    def __init__(self, user):
+        self.user = user
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        assert self.queries == 1, "admin looked up again instead of cached"
+        return SimpleNamespace(scalar_one_or_none=lambda: self.user)
+
+
+def bearer(username):
+    token = auth.create_access_token({"sub": username})
+    return SimpleNamespace(credentials=token)
+
+
+def test_admin_lookups_are_cached(monkeypatch):
+    monkeypatch.setattr(auth, "admin_cache", auth.TTLCache(10, 60))
+    user = SimpleNamespace(username="root")
+    db = OneShotSession(user)
+    for _ in range(3):
+        assert asyncio.run(auth.get_current_admin(bearer("root"), db)) is user
+    assert db.queries == 1
+
+
+def test_invalid_tokens_are_rejected():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(
+            auth.get_current_admin(SimpleNamespace(credentials="nope"), None)
+        )
+    assert exc.value.status_code == 401
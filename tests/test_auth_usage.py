@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import Session
+
+from conftest import DB_FILE, add_api_key, chat
+from src.auth import api_key_cache
+from src.models import APIKey, UsageLog
+from src.usage import UsageLogWriter
+
+
+sync_engine = create_engine(f"sqlite:///{DB_FILE}")
+
+
+def sync_db():
+    return Session(sync_engine)
+
+
+def usage_rows(api_key_id):
+    with sync_db() as db:
+        return db.scalar(
+            select(func.count(UsageLog.id)).where(UsageLog.api_key_id == api_key_id)
+        )
+
+
+def test_unknown_key_is_rejected(client):
+    assert chat(client, {"prompt": "theft"}, key="no-such-key").status_code == 401
+
+
+def test_keys_are_served_from_the_cache_until_evicted(client):
+    add_api_key("cached-key")
+    assert chat(client, {"prompt": "theft"}, key="cached-key").status_code == 200
+    with sync_db() as db:
+        db.execute(update(APIKey).where(APIKey.key == "cached-key").values(active=False))
+        db.commit()
+    # Still cached, so the database isn't asked again
+    assert chat(client, {"prompt": "theft"}, key="cached-key").status_code == 200
+    api_key_cache.pop("cached-key")
+    assert chat(client, {"prompt": "theft"}, key="cached-key").status_code == 401
+
+
+def test_requests_are_logged_by_the_background_writer(client):
+    key_id = add_api_key("logged-key")
+    for _ in range(3):
+        chat(client, {"prompt": "theft"}, key="logged-key")
+    deadline = time.monotonic() + 5
+    while usage_rows(key_id) < 3 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert usage_rows(key_id) == 3
+    # Grouped under the same name as the usage logged before
+    with sync_db() as db:
+        endpoints = db.scalars(
+            select(UsageLog.endpoint).where(UsageLog.api_key_id == key_id)
+        ).all()
+    assert set(endpoints) == {"/v1/chat/completions"}
+
+
+class Unreachable:
+    def __call__(self):
+        raise ConnectionError("database is down")
+
+
+def test_rows_are_kept_for_retry_when_the_database_is_down():
+    writer = UsageLogWriter(Unreachable(), flush_size=2)
+    for _ in range(3):
+        writer.log(1, "/api/chat/completions")
+    asyncio.run(writer.flush())
+    assert writer.stats() == {"buffered": 3, "written": 0, "dropped": 0}
+
+
+def test_oldest_rows_are_dropped_beyond_ten_flushes():
+    writer = UsageLogWriter(Unreachable(), flush_size=2)
+    for i in range(25):
+        writer.log(i, "/api/chat/completions")
+    asyncio.run(writer.flush())
+    assert writer.stats()["buffered"] == 20
+    assert writer.stats()["dropped"] == 5
+    # The newest rows survive
+    assert writer._buffer[-1]["api_key_id"] == 24
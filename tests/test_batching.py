@@ -0,0 +1,83 @@
+import asyncio
+
+from src.batching import MicroBatcher
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, engine, method, questions, top_ks, *options):
+        self.calls.append((method, list(questions), list(top_ks), options))
+        results = [[{"id": i, "question": q}] for i, q in enumerate(questions)]
+        return results, {"batch": len(questions)}
+
+
+def test_concurrent_queries_share_one_search():
+    executor = RecordingExecutor()
+    batcher = MicroBatcher(executor, max_batch_size=8, max_wait_ms=20)
+
+    async def main():
+        return await asyncio.gather(
+            *(batcher.query("engine", f"q{i}", 3, (), False) for i in range(5))
+        )
+
+    results = asyncio.run(main())
+    assert len(executor.calls) == 1
+    assert executor.calls[0][1] == [f"q{i}" for i in range(5)]
+    # Every caller gets its own hits back
+    assert [hits[0]["question"] for hits, _ in results] == [f"q{i}" for i in range(5)]
+    assert batcher.stats()["batch_sizes"] == {5: 1}
+
+
+def test_full_batch_is_sent_without_waiting():
+    executor = RecordingExecutor()
+    batcher = MicroBatcher(executor, max_batch_size=2, max_wait_ms=10_000)
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.query("engine", f"q{i}", 3) for i in range(4))), 1
+        )
+
+    asyncio.run(main())
+    assert [len(call[1]) for call in executor.calls] == [2, 2]
+
+
+def test_queries_with_different_options_are_searched_separately():
+    executor = RecordingExecutor()
+    batcher = MicroBatcher(executor, max_batch_size=8, max_wait_ms=5)
+
+    async def main():
+        await asyncio.gather(
+            batcher.query("engine", "a", 3, (), False),
+            batcher.query("engine", "b", 3, (("book_roman", "V"),), False),
+            batcher.query("engine", "c", 3, (), False),
+        )
+
+    asyncio.run(main())
+    assert sorted(call[1] for call in executor.calls) == [["a", "c"], ["b"]]
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    class FailingExecutor:
+        async def run(self, *args):
+            raise RuntimeError("search failed")
+
+    batcher = MicroBatcher(FailingExecutor(), max_batch_size=8, max_wait_ms=5)
+
+    async def main():
+        return await asyncio.gather(
+            *(batcher.query("engine", q, 3) for q in "ab"), return_exceptions=True
+        )
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(main()))
+
+
+def test_engine_encodes_a_batch_in_one_call(engine, docs):
+    from conftest import FakeEncoder
+
+    questions = [docs[0]["content"], docs[1]["content"], docs[2]["content"]]
+    results, timings = engine.query_batch(questions, [1, 2, 3])
+    assert len(FakeEncoder.calls) == 1 and len(FakeEncoder.calls[0]) == 3
+    assert [len(r) for r in results] == [1, 2, 3]
+    assert "encode_ms" in timings and "search_ms" in timings
@@ -0,0 +1,67 @@
+import time
+
+from src.cache import TTLCache
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+def test_size_zero_disables_caching():
+    cache = TTLCache(maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_probe_without_recording_a_miss():
+    cache = TTLCache()
+    cache.get("a", record_miss=False)
+    cache.get("a")
+    assert cache.stats()["misses"] == 1
+
+
+def test_repeated_query_is_answered_from_the_cache(engine, docs):
+    from conftest import FakeEncoder
+
+    question = docs[3]["content"]
+    assert engine.lookup(question, 3) is None
+    first = engine.query(question, 3)
+    # Case and spacing don't change the key
+    assert engine.lookup("  " + question.upper(), 3) == first
+    results, timings = engine.query_batch([question], [3])
+    assert results[0] == first
+    assert timings == {"cached": 1}
+    assert len(FakeEncoder.calls) == 1
+
+
+def test_rewritten_files_do_not_change_a_loaded_engine(tmp_path, docs):
+    from conftest import build
+    from src.model_engine import FaissEngine
+
+    index_file, metadata_file = build(str(tmp_path), docs[:20])
+    engine = FaissEngine(index_file, metadata_file)
+    question = docs[3]["content"]
+    first = engine.query(question, 3)
+    version = engine.version
+
+    # A rebuild in place is served by the engine the registry swaps in, so
+    # this one keeps its version and cached results, which still match its
+    # index and metadata
+    build(str(tmp_path), docs[20:40])
+    assert engine.version == version
+    assert engine.lookup(question, 3) == first
+    assert FaissEngine(index_file, metadata_file).version != version
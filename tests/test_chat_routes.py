@@ -0,0 +1,53 @@
+import orjson
+import pytest
+
+from conftest import chat
+
+BATCH = "/api/chat/completions/batch"
+
+
+def test_batch_answers_every_prompt_in_order(client, docs):
+    prompts = [{"prompt": docs[i]["content"], "top_k": 2} for i in (0, 5, 9)]
+    response = chat(client, {"prompts": prompts}, path=BATCH)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [len(r) for r in results] == [2, 2, 2]
+    # Each prompt is an article's own text, so that article comes first
+    assert [r[0]["article_number"] for r in results] == [
+        docs[i]["article_number"] for i in (0, 5, 9)
+    ]
+
+
+def test_batch_streams_one_ndjson_line_per_prompt(client, docs):
+    prompts = [{"prompt": docs[i]["content"], "top_k": 1} for i in range(3)]
+    response = chat(client, {"prompts": prompts, "stream": True}, path=BATCH)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2]
+
+
+@pytest.mark.parametrize("top_k", [0, -1, 11, 10_000])
+def test_top_k_out_of_range_is_rejected(client, top_k):
+    assert chat(client, {"prompt": "theft", "top_k": top_k}).status_code == 422
+    body = {"prompts": [{"prompt": "theft", "top_k": top_k}]}
+    assert chat(client, body, path=BATCH).status_code == 422
+
+
+def test_largest_top_k_is_accepted(client):
+    from src import config
+
+    response = chat(client, {"prompt": "theft", "top_k": config.max_top_k})
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == config.max_top_k
+
+
+def test_oversized_batches_are_rejected(client):
+    from src import config
+
+    prompts = [{"prompt": "theft"}] * (config.max_batch_prompts + 1)
+    response = chat(client, {"prompts": prompts}, path=BATCH)
+    assert response.status_code == 422
+    schema = client.get("/openapi.json").json()["components"]["schemas"]
+    assert schema["BatchChatRequest"]["properties"]["prompts"]["maxItems"] == (
+        config.max_batch_prompts
+    )
@@ -0,0 +1,44 @@
+import pytest
+
+from embed_index import chunk_text
+
+# Articles in the test corpus longer than one chunk
+LONG_ROWS = (42, 183, 269, 478, 524, 864)
+
+
+def test_long_texts_become_overlapping_windows():
+    words = [f"w{i}" for i in range(25)]
+    chunks = chunk_text(" ".join(words), size=10, overlap=4)
+    assert [c.split()[0] for c in chunks] == ["w0", "w6", "w12", "w18"]
+    assert chunks[0].split()[-4:] == chunks[1].split()[:4]
+    assert chunks[-1].split()[-1] == "w24"
+
+
+def test_short_texts_and_size_zero_are_one_chunk():
+    assert chunk_text("a b c", size=10) == ["a b c"]
+    assert chunk_text("a b c d", size=0) == ["a b c d"]
+    with pytest.raises(ValueError):
+        chunk_text("a b c d e", size=2, overlap=2)
+
+
+def later_chunk(docs, row):
+    chunks = chunk_text(docs[row]["content"])
+    assert len(chunks) > 1
+    return chunks[-1]
+
+
+def test_every_chunk_is_searchable(engine, docs):
+    assert engine.chunked
+    for row in LONG_ROWS:
+        hits = engine.query(later_chunk(docs, row), 5)
+        assert hits[0]["id"] == row
+        # Chunks are merged, so an article is returned once
+        assert len({hit["id"] for hit in hits}) == len(hits)
+
+
+@pytest.mark.parametrize("row", LONG_ROWS)
+def test_filtered_search_matches_a_later_chunk(engine, docs, row):
+    filters = (("book_roman", docs[row]["book_roman"]),)
+    hits = engine.query_batch([later_chunk(docs, row)], [3], filters)[0][0]
+    assert hits[0]["id"] == row
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
@@ -0,0 +1,41 @@
+import re
+
+import pytest
+
+from conftest import ROOT
+from corpusv2 import write_corpus
+from embed_index import load_corpus
+
+SCRIPTS = ("corpusv2.py", "embed_index.py", "benchmark_index.py", "export_onnx.py")
+
+
+@pytest.mark.parametrize("suffix", [".json", ".jsonl"])
+def test_corpus_files_round_trip(tmp_path, docs, suffix):
+    path = str(tmp_path / f"corpus{suffix}")
+    assert write_corpus(iter(docs[:25]), path) == 25
+    assert load_corpus(path) == docs[:25]
+
+
+def test_empty_corpus_is_valid_json(tmp_path):
+    path = str(tmp_path / "corpus.json")
+    assert write_corpus(iter([]), path) == 0
+    assert load_corpus(path) == []
+
+
+def test_trainer_scripts_share_the_default_corpus():
+    defaults = set()
+    for script in SCRIPTS:
+        source = (ROOT / "trainer" / script).read_text(encoding="utf-8")
+        defaults.update(re.findall(r'default="(trainer/corpus[^"]*)"', source))
+    assert len(defaults) == 1
+    assert (ROOT / defaults.pop()).exists()
+
+
+def test_parity_texts_read_jsonl(tmp_path, docs):
+    from export_onnx import parity_texts
+
+    path = str(tmp_path / "corpus.jsonl")
+    write_corpus(iter(docs[:3]), path)
+    texts = parity_texts(path, 2)
+    assert texts[1] == docs[0]["content"] and texts[3] == docs[1]["content"]
+    assert len(texts) == 4
@@ -0,0 +1,42 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src import database
+
+
+def test_sql_echo_is_off_by_default():
+    assert database.DB_ECHO is False
+    assert database.engine.echo is False
+
+
+def test_pool_records_checkouts_and_wait_times(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=database.TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+
+    async def query():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    pool = engine.pool
+
+    async def main():
+        # Two at once on a pool of one: the second waits for the first
+        await asyncio.gather(query(), query())
+        await engine.dispose()
+
+    asyncio.run(main())
+    assert pool.checkouts >= 2
+    assert pool.wait_max >= 0
+    assert pool.wait_total >= pool.wait_max
+
+
+def test_pool_stats_reports_the_engine_pool():
+    stats = database.pool_stats()
+    assert stats["size"] == database.DB_POOL_SIZE
+    assert {"checked_out", "overflow", "wait_mean_ms", "wait_max_ms"} <= set(stats)
@@ -0,0 +1,68 @@
+import os
+import runpy
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+
+def config_value(tmp_path, name, **env):
+    environ = {
+        k: v
+        for k, v in os.environ.items()
+        if k not in ("WEB_CONCURRENCY", "INFERENCE_WORKERS", "ENCODER_THREADS")
+    }
+    environ.update(env, PYTHONPATH=str(ROOT))
+    # Run from an empty directory so no .env file interferes
+    out = subprocess.run(
+        [sys.executable, "-c", f"from src import config; print(config.{name})"],
+        cwd=tmp_path,
+        env=environ,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return out.stdout.strip()
+
+
+def test_encoder_threads_split_cores_between_workers_and_searches(tmp_path):
+    cores = os.cpu_count() or 1
+    threads = config_value(
+        tmp_path, "encoder_threads", WEB_CONCURRENCY="2", INFERENCE_WORKERS="3"
+    )
+    assert int(threads) == max(1, cores // 6)
+    assert int(config_value(tmp_path, "encoder_threads", ENCODER_THREADS="5")) == 5
+
+
+def test_gunicorn_starts_web_concurrency_workers(monkeypatch):
+    from src import config
+
+    monkeypatch.setattr(config, "web_concurrency", 3)
+    settings = runpy.run_path(str(ROOT / "gunicorn.conf.py"))
+    assert settings["workers"] == 3
+
+
+def test_procfile_sets_the_worker_count_through_web_concurrency():
+    procfile = (ROOT / "Procfile").read_text()
+    assert "WEB_CONCURRENCY=" in procfile
+    assert " -w " not in procfile and "--workers" not in procfile
+
+
+def test_unknown_backends_are_rejected():
+    from src.encoders import load_encoder
+
+    with pytest.raises(ValueError, match="ENCODER_BACKEND"):
+        load_encoder("tensorflow")
+
+
+def test_torch_encoder_caps_the_intra_op_threads(monkeypatch):
+    import torch
+
+    from src.encoders import torch_encoder
+
+    monkeypatch.setattr(torch, "set_num_threads", lambda n: seen.append(n))
+    seen = []
+    torch_encoder(threads=3)
+    assert seen == [3]
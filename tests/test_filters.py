@@ -0,0 +1,53 @@
+from conftest import chat
+from src.models import SearchFilters
+
+
+def test_filter_key_uses_metadata_fields_and_upper_case():
+    key = SearchFilters(book=" v ", chapter="ii").key()
+    assert key == (("book_roman", "V"), ("chapter_roman", "II"))
+
+
+def test_filtered_search_only_returns_that_part_of_the_code(engine, docs):
+    filters = (("book_roman", "V"),)
+    hits = engine.query_batch(["theft of property"], [10], filters)[0][0]
+    assert len(hits) == 10
+    assert all(docs[hit["id"]]["book_roman"] == "V" for hit in hits)
+
+
+def test_filters_combine(engine, docs):
+    filters = (("book_roman", "V"), ("chapter_roman", "I"))
+    hits = engine.query_batch(["theft of property"], [10], filters)[0][0]
+    assert hits
+    assert all(
+        (docs[h["id"]]["book_roman"], docs[h["id"]]["chapter_roman"]) == ("V", "I")
+        for h in hits
+    )
+
+
+def test_unknown_filter_value_returns_nothing_without_searching(engine):
+    from conftest import FakeEncoder
+
+    filters = (("book_roman", "XX"),)
+    results, _ = engine.query_batch(["theft"], [3], filters)
+    assert results == [[]]
+    assert FakeEncoder.calls == []
+    assert engine._selectors.get(filters) is None
+
+
+def test_selector_cache_is_bounded(engine, docs, monkeypatch):
+    from src.cache import TTLCache
+
+    monkeypatch.setattr(engine, "_selectors", TTLCache(2, 60))
+    books = sorted({doc["book_roman"] for doc in docs})
+    for book in books:
+        engine.query_batch(["theft"], [1], (("book_roman", book),))
+    assert engine._selectors.stats()["size"] == 2
+
+
+def test_filters_through_the_api(client, docs):
+    body = {"prompt": "punishment", "top_k": 5, "filters": {"book": "iii"}}
+    results = chat(client, body).json()["results"]
+    assert len(results) == 5
+    assert {r["book_roman"] for r in results} == {"III"}
+    body["filters"] = {"book": "XX"}
+    assert chat(client, body).json()["results"] == []
@@ -0,0 +1,63 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+
+from conftest import FakeEncoder, build
+from src.model_engine import FaissEngine
+
+
+def encoded_texts():
+    return [text for call in FakeEncoder.calls for text in call]
+
+
+def test_only_changed_articles_are_re_encoded(tmp_path, docs):
+    subset = copy.deepcopy(docs[:40])
+    build(str(tmp_path), subset)
+    assert len(encoded_texts()) >= 40
+
+    FakeEncoder.calls.clear()
+    subset[3]["content"] = "amended: whoever steals a bicycle is punishable"
+    removed = subset.pop(10)
+    index_file, metadata_file = build(str(tmp_path), subset)
+    assert encoded_texts() == [subset[3]["content"]]
+
+    engine = FaissEngine(index_file, metadata_file)
+    # One vector per chunk, and every article still has its chunks
+    assert engine.index.ntotal == len(engine._vector_ids)
+    assert set(engine._vector_rows.tolist()) == set(range(len(subset)))
+    hit = engine.query(subset[3]["content"], 1)[0]
+    assert hit["id"] == 3
+    hits = engine.query(removed["content"], 5)
+    contents = [engine.metadata.field(h["id"], "content") for h in hits]
+    assert removed["content"] not in contents
+
+
+def test_unchanged_corpus_is_not_encoded_again(tmp_path, docs):
+    build(str(tmp_path), docs[:20])
+    FakeEncoder.calls.clear()
+    build(str(tmp_path), docs[:20])
+    assert encoded_texts() == []
+
+
+def test_selectors_are_cached_without_search_params(engine):
+    filters = (("book_roman", "V"),)
+    engine.query_batch(["theft"], [3], filters)
+    bitmap, sel = engine._selectors.get(filters)
+    assert isinstance(sel, faiss.IDSelectorBitmap)
+    first = engine._search_params(sel)
+    assert engine._search_params(sel) is not first
+
+
+def test_concurrent_filtered_searches_agree_with_sequential_ones(engine, docs):
+    questions = [docs[i]["content"] for i in range(0, 200, 10)]
+    filters = (("book_roman", "V"),)
+    expected = [engine.query_batch([q], [5], filters)[0][0] for q in questions]
+
+    def search(q):
+        engine.result_cache.clear()
+        return engine.query_batch([q], [5], filters)[0][0]
+
+    with ThreadPoolExecutor(8) as pool:
+        for _ in range(5):
+            assert list(pool.map(search, questions)) == expected
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import benchmark_index
+from embed_index import INDEX_TYPES, build_index, index_spec
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((2000, 32)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def test_index_spec_sizes_ivf_and_pq_to_the_corpus():
+    assert index_spec("ivf-flat", 10_000, 384) == "IVF400,Flat"
+    assert index_spec("ivf-pq", 10_000, 384) == "IVF400,PQ48"
+    assert index_spec("flat", 10, 384) == "Flat"
+    # Anything else is passed to faiss.index_factory as is
+    assert index_spec("IVF8,SQ8", 10, 384) == "IVF8,SQ8"
+
+
+@pytest.mark.parametrize("index_type", list(INDEX_TYPES))
+def test_every_index_type_finds_a_stored_vector(vectors, index_type):
+    index = build_index(vectors, index_type)
+    assert index.ntotal == len(vectors)
+    if hasattr(index, "nprobe"):
+        index.nprobe = 16
+    _, found = index.search(vectors[:20], 5)
+    # Approximate indexes may miss a few, but not most
+    assert np.mean(found[:, 0] == np.arange(20)) >= 0.8
+
+
+def test_ids_are_kept_when_given(vectors):
+    ids = np.arange(len(vectors), dtype=np.int64) * 10 + 7
+    index = build_index(vectors, "flat", ids=ids)
+    _, found = index.search(vectors[:3], 1)
+    assert found[:, 0].tolist() == ids[:3].tolist()
+
+
+def test_recall_at_k():
+    truth = np.array([[1, 2], [3, 4]])
+    found = np.array([[2, -1], [3, 4]])
+    assert benchmark_index.recall_at_k(found, truth) == 0.75
+
+
+def test_benchmark_prints_a_row_per_index_type(tmp_path, docs, capsys):
+    import json
+
+    corpus = tmp_path / "corpus.json"
+    corpus.write_text(json.dumps(docs[:200]))
+    benchmark_index.benchmark(str(corpus), ["flat", "hnsw"], k=5)
+    rows = capsys.readouterr().out.splitlines()
+    flat = next(row for row in rows if row.startswith("flat"))
+    assert float(flat.split()[1]) == 1.0  # exact search has perfect recall
+    assert any(row.startswith("hnsw") for row in rows)
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from src.inference import InferenceExecutor
+
+
+class SlowEngine:
+    spec = None
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.threads = []
+
+    def query_batch(self, questions, top_ks):
+        self.threads.append(threading.current_thread().name)
+        self.release.wait(5)
+        return [[] for _ in questions], {}
+
+
+def test_runs_engine_calls_off_the_event_loop():
+    engine = SlowEngine()
+    engine.release.set()
+    executor = InferenceExecutor(workers=1, queue_size=1, timeout=5)
+
+    async def main():
+        return await executor.run(engine, "query_batch", ["q"], [3])
+
+    assert asyncio.run(main()) == ([[]], {})
+    assert engine.threads[0].startswith("inference")
+    executor.shutdown()
+
+
+def test_rejects_calls_beyond_the_queue_with_503():
+    engine = SlowEngine()
+    executor = InferenceExecutor(workers=1, queue_size=1, timeout=5)
+
+    async def main():
+        running = [
+            asyncio.create_task(executor.run(engine, "query_batch", ["q"], [3]))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as error:
+            await executor.run(engine, "query_batch", ["q"], [3])
+        engine.release.set()
+        await asyncio.gather(*running)
+        return error.value
+
+    error = asyncio.run(main())
+    assert error.status_code == 503
+    assert executor.stats()["rejected"] == 1
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+def test_times_out_with_504_but_keeps_the_slot_until_done():
+    engine = SlowEngine()
+    executor = InferenceExecutor(workers=1, queue_size=0, timeout=0.05)
+
+    async def main():
+        with pytest.raises(HTTPException) as error:
+            await executor.run(engine, "query_batch", ["q"], [3])
+        # The call is still running, so the only slot is still taken
+        assert executor.pending == 1
+        engine.release.set()
+        await asyncio.sleep(0.05)
+        return error.value
+
+    assert asyncio.run(main()).status_code == 504
+    assert executor.pending == 0
+    assert executor.stats()["timed_out"] == 1
+    executor.shutdown()
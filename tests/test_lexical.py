@@ -0,0 +1,106 @@
+import pytest
+
+from src.lexical import BM25Index, article_numbers, bm25_path, tokenize
+
+
+@pytest.mark.parametrize(
+    "query, numbers",
+    [
+        ("What does Article 539 say?", ["539"]),
+        ("art. 32", ["32"]),
+        ("Art.32 and theft", ["32"]),
+        ("Articles 539 on homicide", ["539"]),
+        ("Arts 32 and 33", ["32", "33"]),
+        ("Arts. 12, 14 & 16", ["12", "14", "16"]),
+        ("Articles 539-541", ["539", "540", "541"]),
+        ("articles 539 to 541", ["539", "540", "541"]),
+        ("Article 32 and article 32", ["32"]),
+        # Not ranges worth expanding: only the ends
+        ("Articles 5 to 400", ["5", "400"]),
+        ("Articles 541-539", ["541", "539"]),
+        ("the article on theft", []),
+        ("particle 5", []),
+    ],
+)
+def test_article_numbers(query, numbers):
+    assert article_numbers(query) == numbers
+
+
+def test_tokenize_drops_case_punctuation_and_stopwords():
+    assert tokenize("The Theft of a cow, by force!") == ["theft", "cow", "force"]
+
+
+@pytest.fixture(scope="module")
+def lexical(docs):
+    return BM25Index.build(docs)
+
+
+def test_bm25_ranks_articles_containing_the_terms(lexical, docs):
+    hits = lexical.search("genocide", 5)
+    assert hits
+    assert all("genocide" in tokenize(" ".join(docs[row].values())) for row, _ in hits)
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+
+
+def test_bm25_round_trips_through_its_file(lexical, tmp_path):
+    path = bm25_path(str(tmp_path / "x.index"))
+    lexical.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.search("armed robbery", 5) == lexical.search("armed robbery", 5)
+    assert loaded.article_rows("Article 539") == lexical.article_rows("Article 539")
+
+
+def test_article_rows_follow_the_query_order(lexical, docs):
+    rows = lexical.article_rows("Articles 33 and 32")
+    assert [docs[row]["article_number"] for row in rows][:2] == ["33", "32"]
+
+
+def rows_of(docs, number):
+    return [row for row, doc in enumerate(docs) if doc["article_number"] == number]
+
+
+@pytest.fixture
+def hybrid_engine(engine, lexical, monkeypatch):
+    monkeypatch.setattr(engine, "lexical", lexical)
+    return engine
+
+
+def test_cited_articles_come_first(hybrid_engine, docs):
+    hits = hybrid_engine.query("what is the punishment under Articles 539-540", 5)
+    cited = rows_of(docs, "539") + rows_of(docs, "540")
+    assert [hit["id"] for hit in hits[: len(cited)]] == cited
+    # Lexical-only hits are still scored against the prompt
+    assert all(hit["score"] is not None for hit in hits)
+
+
+def test_cited_articles_outside_the_filter_are_not_boosted(hybrid_engine, docs):
+    row = rows_of(docs, "539")[0]
+    other_book = next(
+        doc["book_roman"] for doc in docs if doc["book_roman"] != docs[row]["book_roman"]
+    )
+    hits = hybrid_engine.query_batch(
+        ["Article 539"], [5], (("book_roman", other_book),)
+    )[0][0]
+    assert row not in [hit["id"] for hit in hits]
+    assert all(docs[hit["id"]]["book_roman"] == other_book for hit in hits)
+
+
+def test_hybrid_search_is_off_unless_enabled(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    from conftest import ROOT
+
+    env = {k: v for k, v in os.environ.items() if k != "HYBRID_SEARCH"}
+    env["PYTHONPATH"] = str(ROOT)
+    # Run from an empty directory so no .env file sets it either
+    out = subprocess.run(
+        [sys.executable, "-c", "from src import config; print(config.hybrid_search)"],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert out.stdout.strip() == "False"
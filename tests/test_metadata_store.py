@@ -0,0 +1,72 @@
+import json
+import os
+import time
+
+import pytest
+
+from src.metadata_store import (
+    JsonMetadata,
+    MetadataStore,
+    load_metadata,
+    store_path,
+    write_metadata_store,
+)
+
+
+@pytest.fixture
+def store(tmp_path, docs):
+    path = str(tmp_path / "meta.store")
+    write_metadata_store(docs, path)
+    return MetadataStore(path)
+
+
+def test_records_round_trip(store, docs):
+    assert len(store) == len(docs)
+    assert store[0] == docs[0]
+    assert store[-1] == docs[-1]
+    assert list(store) == docs
+
+
+def test_single_fields_decode_without_the_rest(store, docs):
+    assert store.field(42, "content") == docs[42]["content"]
+    assert store.field(42, "book_roman") == docs[42]["book_roman"]
+    assert store.fields == list(docs[0])
+
+
+def test_repeated_values_are_stored_once(tmp_path, docs):
+    path = str(tmp_path / "meta.store")
+    write_metadata_store(docs, path)
+    # Book and chapter names repeat on every article, content never does
+    text = sum(len(json.dumps(doc, ensure_ascii=False)) for doc in docs)
+    assert os.path.getsize(path) < text
+
+
+def test_out_of_range_rows_raise(store):
+    with pytest.raises(IndexError):
+        store[len(store)]
+
+
+def test_none_values_are_stored_as_empty_strings(tmp_path):
+    path = str(tmp_path / "meta.store")
+    write_metadata_store([{"a": None, "b": 3}], path)
+    assert MetadataStore(path)[0] == {"a": "", "b": "3"}
+
+
+def test_load_metadata_prefers_an_up_to_date_store(tmp_path, docs):
+    json_file = tmp_path / "meta.json"
+    json_file.write_text(json.dumps(docs[:3]))
+    records, loaded = load_metadata(str(json_file))
+    assert isinstance(records, JsonMetadata) and loaded == str(json_file)
+    assert records.field(1, "article_number") == docs[1]["article_number"]
+
+    write_metadata_store(docs[:3], store_path(str(json_file)))
+    records, loaded = load_metadata(str(json_file))
+    assert isinstance(records, MetadataStore)
+    assert loaded == store_path(str(json_file))
+
+    # A JSON file newer than its store wins
+    json_file.write_text(json.dumps(docs[:2]))
+    later = time.time() + 10
+    os.utime(json_file, (later, later))
+    records, _ = load_metadata(str(json_file))
+    assert isinstance(records, JsonMetadata) and len(records) == 2
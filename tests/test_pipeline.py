@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+import embed_index
+import pipeline
+from conftest import FakeEncoder, build
+from src.index_files import ids_path
+from src.model_engine import FaissEngine
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    # Only fingerprinted; the articles come from the patched extractor
+    path = tmp_path / "code.pdf"
+    path.write_bytes(b"%PDF")
+    return str(path)
+
+
+def extract(docs, fail_after=None):
+    def iter_law_structure(pdf_file, workers=None):
+        for i, doc in enumerate(docs):
+            if i == fail_after:
+                raise KeyboardInterrupt
+            yield doc
+
+    return iter_law_structure
+
+
+def run(tmp_path, pdf, **kwargs):
+    index_file = str(tmp_path / "out.index")
+    metadata_file = str(tmp_path / "out.json")
+    pipeline.run_pipeline([pdf], index_file, metadata_file, batch_size=25, **kwargs)
+    return index_file, metadata_file
+
+
+def test_pipeline_writes_what_embed_index_writes(tmp_path, pdf, docs, monkeypatch):
+    subset = docs[:80]
+    monkeypatch.setattr(pipeline, "iter_law_structure", extract(subset))
+    index_file, metadata_file = run(tmp_path, pdf)
+    expected_dir = tmp_path / "expected"
+    expected_dir.mkdir()
+    expected_index, _ = build(str(expected_dir), subset)
+
+    assert np.array_equal(
+        np.load(ids_path(index_file)), np.load(ids_path(expected_index))
+    )
+    with np.load(embed_index.embeddings_path(index_file)) as got, np.load(
+        embed_index.embeddings_path(expected_index)
+    ) as want:
+        assert list(got["keys"]) == list(want["keys"])
+        assert np.allclose(got["vectors"], want["vectors"])
+
+    engine = FaissEngine(index_file, metadata_file)
+    assert engine.query(subset[40]["content"], 1)[0]["id"] == 40
+    # The checkpoint, memory-mapped rows and keys included, is cleaned up
+    assert not (tmp_path / "out.checkpoint").exists()
+
+
+def test_interrupted_runs_resume_after_the_last_batch(tmp_path, pdf, docs, monkeypatch):
+    subset = docs[:80]
+    monkeypatch.setattr(pipeline, "iter_law_structure", extract(subset, fail_after=60))
+    with pytest.raises(KeyboardInterrupt):
+        run(tmp_path, pdf)
+
+    FakeEncoder.calls.clear()
+    monkeypatch.setattr(pipeline, "iter_law_structure", extract(subset))
+    index_file, metadata_file = run(tmp_path, pdf)
+    encoded = [text for call in FakeEncoder.calls for text in call]
+    # Two full batches of 25 were checkpointed; only the rest is embedded
+    assert encoded == [
+        text for doc in subset[50:] for text in embed_index.chunk_text(doc["content"])
+    ]
+    engine = FaissEngine(index_file, metadata_file)
+    assert len(engine.metadata) == 80
+    assert engine.query(subset[10]["content"], 1)[0]["id"] == 10
+
+
+def test_indexes_are_filled_a_slice_at_a_time(docs, monkeypatch):
+    vectors = np.stack([FakeEncoder().encode([doc["content"]])[0] for doc in docs[:50]])
+    ids = np.arange(100, 150, dtype=np.int64)
+    whole = embed_index.build_index(vectors, ids=ids)
+    monkeypatch.setattr(embed_index, "ADD_BATCH", 7)
+    sliced = embed_index.build_index(vectors, ids=ids)
+    assert sliced.ntotal == 50
+    assert np.array_equal(
+        sliced.search(vectors[:5], 3)[1], whole.search(vectors[:5], 3)[1]
+    )
+
+
+def test_ids_are_saved_a_slice_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(embed_index, "ADD_BATCH", 3)
+    path = str(tmp_path / "x.ids.npy.tmp")
+    embed_index.save_ids(path, np.arange(10, 20), np.arange(10) // 2)
+    pairs = np.load(path)
+    assert pairs.tolist() == [[10 + i, i // 2] for i in range(10)]
@@ -0,0 +1,50 @@
+import orjson
+import pytest
+
+from conftest import chat
+
+BATCH = "/api/chat/completions/batch"
+
+
+def test_fields_limit_the_metadata_sent(client, docs):
+    response = chat(
+        client, {"prompt": docs[2]["content"], "fields": ["article_number"]}
+    )
+    hit = response.json()["results"][0]
+    assert set(hit) == {"id", "score", "article_number"}
+    assert hit["article_number"] == docs[2]["article_number"]
+
+
+def test_snippets_cut_content_at_a_word(client, docs):
+    response = chat(
+        client, {"prompt": docs[2]["content"], "top_k": 1, "snippet_chars": 40}
+    )
+    content = response.json()["results"][0]["content"]
+    assert content.endswith("…")
+    assert len(content) <= 41
+    assert docs[2]["content"].startswith(content[:-1])
+
+
+def test_unprojected_hits_are_the_full_records(client, docs):
+    hit = chat(client, {"prompt": docs[2]["content"], "top_k": 1}).json()["results"][0]
+    assert {k: v for k, v in hit.items() if k not in ("id", "score")} == docs[2]
+
+
+def test_full_records_are_encoded_when_the_engine_loads(engine, docs):
+    assert len(engine._fragments) == len(docs)
+    hit = {"id": 2, "score": 0.5}
+    assert orjson.loads(engine.render([hit])) == [{**docs[2], **hit}]
+
+
+@pytest.mark.parametrize("snippet_chars", [-1, -500])
+def test_negative_snippet_chars_are_rejected(client, snippet_chars):
+    body = {"prompt": "theft", "snippet_chars": snippet_chars}
+    assert chat(client, body).status_code == 422
+    body = {"prompts": [{"prompt": "theft"}], "snippet_chars": snippet_chars}
+    assert chat(client, body, path=BATCH).status_code == 422
+
+
+def test_zero_snippet_chars_sends_no_content(client, docs):
+    response = chat(client, {"prompt": docs[2]["content"], "snippet_chars": 0})
+    assert response.status_code == 200
+    assert all(hit["content"] == "…" for hit in response.json()["results"])
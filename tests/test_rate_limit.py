@@ -0,0 +1,62 @@
+import asyncio
+
+from conftest import add_api_key, chat
+from src.rate_limit import MemoryBackend
+
+
+BATCH = "/api/chat/completions/batch"
+
+
+def take(backend, now, cost=1):
+    return asyncio.run(backend.take("key", 1.0, 10, now, cost))
+
+
+def test_bucket_charges_the_cost():
+    backend = MemoryBackend()
+    assert take(backend, 0, cost=8) == 0
+    assert take(backend, 0, cost=2) == 0
+    assert take(backend, 0) == 1.0
+
+
+def test_cost_above_burst_passes_on_a_full_bucket_and_leaves_debt():
+    backend = MemoryBackend()
+    assert take(backend, 0, cost=15) == 0
+    # Five tokens in debt: six seconds until one is available again
+    assert take(backend, 0) == 6.0
+    assert take(backend, 6) == 0
+
+
+def test_daily_count_adds_the_cost():
+    backend = MemoryBackend()
+    assert asyncio.run(backend.count("key", "2026-01-01", 5)) == 5
+    assert asyncio.run(backend.count("key", "2026-01-01")) == 6
+    assert asyncio.run(backend.count("key", "2026-01-02", 3)) == 3
+
+
+def batch(client, size, key):
+    prompts = [{"prompt": "theft"}] * size
+    return chat(client, {"prompts": prompts}, key=key, path=BATCH)
+
+
+def test_batches_cost_one_token_per_prompt(client):
+    add_api_key("batch-limited", rate_limit_per_minute=10, burst=10)
+    assert batch(client, 8, "batch-limited").status_code == 200
+    assert chat(client, {"prompt": "theft"}, key="batch-limited").status_code == 200
+    response = batch(client, 5, "batch-limited")
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+
+def test_batches_count_every_prompt_against_the_quota(client):
+    add_api_key("batch-quota", daily_quota=5)
+    assert batch(client, 6, "batch-quota").status_code == 429
+
+
+def test_requests_are_not_charged_while_the_engine_loads(client, monkeypatch):
+    add_api_key("loading-quota", daily_quota=1)
+    engine = client.app.state.faiss_engine
+    monkeypatch.setattr(client.app.state, "faiss_engine", None)
+    assert chat(client, {"prompt": "theft"}, key="loading-quota").status_code == 503
+    assert batch(client, 3, "loading-quota").status_code == 503
+    monkeypatch.setattr(client.app.state, "faiss_engine", engine)
+    assert chat(client, {"prompt": "theft"}, key="loading-quota").status_code == 200
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import build, chat
+from src.registry import IndexRegistry, build_engine
+
+
+class Warmer:
+    def __init__(self):
+        self.warmed = []
+
+    async def warm_up(self, engine):
+        self.warmed.append(engine.name)
+
+
+@pytest.fixture
+def registry(tmp_path, docs):
+    versions = {}
+    for name, subset in (("v1", docs[:30]), ("v2", docs[30:60])):
+        directory = tmp_path / name
+        directory.mkdir()
+        index_file, metadata_file = build(str(directory), subset)
+        versions[name] = {"index_file": index_file, "metadata_file": metadata_file}
+    manifest = tmp_path / "registry.json"
+    manifest.write_text(json.dumps({"active": "v1", "versions": versions}))
+    return IndexRegistry(str(manifest))
+
+
+@pytest.fixture
+def app(registry):
+    state = SimpleNamespace(
+        faiss_engine=build_engine(registry.resolve()), inference=Warmer()
+    )
+    return SimpleNamespace(state=state)
+
+
+def test_swap_warms_and_replaces_the_engine(registry, app, docs):
+    old = app.state.faiss_engine
+    new = asyncio.run(registry.swap(app, "v2"))
+    assert app.state.faiss_engine is new and new.name == "v2"
+    assert app.state.inference.warmed == ["v2"]
+    assert registry.history[-1]["previous"] == "v1"
+    assert registry.state == "idle"
+    # Requests holding the old engine still finish on it
+    assert old.query(docs[4]["content"], 1)[0]["id"] == 4
+    assert new.query(docs[34]["content"], 1)[0]["id"] == 4
+
+
+def test_swapping_to_the_serving_version_keeps_the_engine(registry, app):
+    current = app.state.faiss_engine
+    assert asyncio.run(registry.swap(app)) is current
+    assert app.state.inference.warmed == []
+
+
+def test_a_failed_load_keeps_the_old_version_serving(registry, app):
+    current = app.state.faiss_engine
+    with pytest.raises(ValueError):
+        asyncio.run(registry.swap(app, "v9"))
+    assert app.state.faiss_engine is current
+    assert registry.state == "failed" and "v9" in registry.error
+
+
+def test_a_swap_activates_the_version_once_it_is_serving(registry, app):
+    asyncio.run(registry.swap(app, "v2", activate=True))
+    assert registry.resolve()[2] == "v2"
+
+
+def test_a_version_that_fails_to_load_is_not_activated(registry, app, tmp_path):
+    manifest = json.loads(open(registry.manifest).read())
+    manifest["versions"]["broken"] = {
+        "index_file": str(tmp_path / "missing.index"),
+        "metadata_file": str(tmp_path / "missing.json"),
+    }
+    with open(registry.manifest, "w") as f:
+        json.dump(manifest, f)
+    current = app.state.faiss_engine
+    with pytest.raises(RuntimeError):
+        asyncio.run(registry.swap(app, "broken", activate=True))
+    assert app.state.faiss_engine is current
+    assert registry.resolve()[2] == "v1"
+
+
+def test_reloading_a_version_needs_a_manifest(client, monkeypatch):
+    from src.auth import get_current_admin
+    from src.registry import index_registry
+
+    monkeypatch.setattr(index_registry, "manifest", None)
+    monkeypatch.setitem(
+        client.app.dependency_overrides, get_current_admin, lambda: None
+    )
+    response = client.post("/api/admin/index/reload", params={"version": "v2"})
+    assert response.status_code == 400
+
+
+def test_activate_rewrites_the_manifest(registry):
+    registry.activate("v2")
+    assert registry.resolve()[2] == "v2"
+    with pytest.raises(ValueError):
+        registry.activate("v9")
+
+
+def test_without_a_manifest_the_version_follows_the_files(tmp_path, docs, monkeypatch):
+    from src import config
+
+    index_file, metadata_file = build(str(tmp_path), docs[:10])
+    monkeypatch.setattr(config, "index_file", index_file)
+    monkeypatch.setattr(config, "metadata_file", metadata_file)
+    registry = IndexRegistry()
+    name = registry.resolve()[2]
+    assert list(registry.versions()) == [name]
+    stat = os.stat(metadata_file)
+    os.utime(metadata_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert registry.resolve()[2] != name
+
+
+def test_responses_name_the_serving_version(client):
+    response = chat(client, {"prompt": "theft"})
+    version = client.app.state.faiss_engine.name
+    assert response.headers["x-index-version"] == version
+    assert response.json()["index_version"] == version
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+
+from conftest import FakeCrossEncoder, chat
+from src import config
+from src.batching import MicroBatcher
+
+
+QUESTION = "punishment for theft of cattle"
+
+
+@pytest.fixture
+def reranking(engine, monkeypatch):
+    monkeypatch.setattr(engine, "reranker", FakeCrossEncoder())
+    monkeypatch.setattr(config, "rerank_batch_size", 2)
+    return engine
+
+
+def ids(hits):
+    return [hit["id"] for hit in hits]
+
+
+def test_candidates_are_scored_in_sub_batches(reranking):
+    (hits,), timings = reranking.query_batch([QUESTION], [3], (), True)
+    # top_k * RERANK_CANDIDATES candidates, two at a time
+    assert FakeCrossEncoder.calls == [2] * (3 * config.rerank_candidates // 2) + [1]
+    assert timings["rerank_skipped"] == 0
+    scores = [hit["rerank_score"] for hit in hits]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_a_passed_deadline_keeps_the_bi_encoder_order(reranking):
+    plain, _ = reranking.query_batch([QUESTION], [3])
+    reranking.result_cache.clear()
+    (hits,), timings = reranking.query_batch(
+        [QUESTION], [3], (), True, [time.monotonic() - 1]
+    )
+    assert FakeCrossEncoder.calls == []
+    assert timings["rerank_skipped"] == 1
+    assert ids(hits) == ids(plain[0])
+
+
+def test_the_deadline_is_checked_between_sub_batches(reranking, monkeypatch):
+    predict = FakeCrossEncoder.predict
+
+    def slow(self, pairs, **kwargs):
+        time.sleep(0.05)
+        return predict(self, pairs, **kwargs)
+
+    monkeypatch.setattr(FakeCrossEncoder, "predict", slow)
+    (hits,), timings = reranking.query_batch(
+        [QUESTION], [3], (), True, [time.monotonic() + 0.02]
+    )
+    assert FakeCrossEncoder.calls == [2]
+    assert timings["rerank_skipped"] == 1
+    assert "rerank_score" not in hits[0]
+
+
+def test_over_budget_results_are_not_cached(reranking):
+    key_args = ([QUESTION], [3], (), True)
+    reranking.query_batch(*key_args, [time.monotonic() - 1])
+    assert reranking.lookup(QUESTION, 3, (), True) is None
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, engine, method, questions, top_ks, *options):
+        self.calls.append(options)
+        return [[] for _ in questions], {}
+
+
+def test_batcher_passes_each_callers_deadline():
+    executor = RecordingExecutor()
+
+    async def main():
+        batcher = MicroBatcher(executor, max_batch_size=2)
+        await asyncio.gather(
+            batcher.query("engine", "a", 1, (), True, deadline=5.0),
+            batcher.query("engine", "b", 1, (), True, deadline=7.0),
+        )
+        await batcher.query("engine", "c", 1, (), False)
+
+    asyncio.run(main())
+    assert executor.calls == [((), True, [5.0, 7.0]), ((), False)]
+
+
+def test_the_budget_counts_from_request_arrival(client, monkeypatch):
+    engine = client.app.state.faiss_engine
+    monkeypatch.setattr(engine, "reranker", FakeCrossEncoder())
+    monkeypatch.setattr(config, "rerank_budget_ms", 0)
+    response = chat(client, {"prompt": "armed robbery penalties", "rerank": True})
+    assert response.json()["timings"]["rerank_skipped"] == 1
+    assert FakeCrossEncoder.calls == []
+
+
+def test_requests_are_stamped_on_arrival():
+    from src.middleware import ReceivedAt
+
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen.update(scope["state"])
+
+    before = time.monotonic()
+    asyncio.run(ReceivedAt(app)({"type": "http"}, None, None))
+    assert before <= seen["received"] <= time.monotonic()
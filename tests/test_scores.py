@@ -0,0 +1,48 @@
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+from conftest import chat, fake_vector
+from src.model_engine import FaissEngine
+
+
+def test_scores_are_cosine_similarities_best_first(engine, docs, monkeypatch):
+    # Dense search only; fusion orders by rank, not score
+    monkeypatch.setattr(engine, "lexical", None)
+    hits = engine.query(docs[7]["content"], 5)
+    assert hits[0]["id"] == 7
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    scores = [hit["score"] for hit in hits]
+    assert scores == sorted(scores, reverse=True)
+    assert all(-1.0 <= s <= 1.0 + 1e-5 for s in scores)
+
+
+def test_above_drops_low_scores_but_keeps_unscored_hits():
+    hits = [{"id": 1, "score": 0.9}, {"id": 2, "score": 0.2}, {"id": 3, "score": None}]
+    assert FaissEngine.above(hits, 0.5) == [hits[0], hits[2]]
+    assert FaissEngine.above(hits, None) == hits
+
+
+def test_min_score_filters_the_response(client, docs):
+    response = chat(client, {"prompt": docs[7]["content"], "min_score": 0.99})
+    results = response.json()["results"]
+    assert [r["article_number"] for r in results] == [docs[7]["article_number"]]
+
+
+def test_legacy_l2_index_reports_cosine_scores(tmp_path, docs):
+    subset = docs[:50]
+    vectors = np.stack([fake_vector(doc["content"]) for doc in subset])
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    faiss.write_index(index, str(tmp_path / "old.index"))
+    (tmp_path / "old.json").write_text(json.dumps(subset))
+
+    legacy = FaissEngine(str(tmp_path / "old.index"), str(tmp_path / "old.json"))
+    assert not legacy.inner_product
+    hits = legacy.query(subset[4]["content"], 3)
+    assert hits[0]["id"] == 4
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    expected = float(vectors[4] @ vectors[hits[1]["id"]])
+    assert hits[1]["score"] == pytest.approx(expected, abs=1e-5)
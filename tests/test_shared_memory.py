@@ -0,0 +1,39 @@
+import faiss
+
+from src import config
+from src.model_engine import FaissEngine
+
+
+def test_memory_mapped_index_answers_like_the_loaded_one(
+    built_index, engine, docs, monkeypatch
+):
+    monkeypatch.setattr(config, "index_mmap", True)
+    mapped = FaissEngine(*built_index)
+    question = docs[20]["content"]
+    assert mapped.query(question, 5) == engine.query(question, 5)
+
+
+def test_read_index_passes_the_mmap_flags(built_index, monkeypatch):
+    seen = []
+    read_index = faiss.read_index
+
+    def spy(path, *flags):
+        seen.append(flags)
+        return read_index(path, *flags)
+
+    monkeypatch.setattr(faiss, "read_index", spy)
+    monkeypatch.setattr(config, "index_mmap", True)
+    FaissEngine._read_index(built_index[0])
+    monkeypatch.setattr(config, "index_mmap", False)
+    FaissEngine._read_index(built_index[0])
+    assert seen[0] and seen[0][0] & faiss.IO_FLAG_MMAP
+    assert seen[1] == ()
+
+
+def test_gunicorn_preloads_the_app_when_the_engine_is_preloaded():
+    import runpy
+
+    from conftest import ROOT
+
+    settings = runpy.run_path(str(ROOT / "gunicorn.conf.py"))
+    assert settings["preload_app"] == config.preload_engine
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+from conftest import DB_FILE, FakeCrossEncoder, ROOT
+from src import config
+from src.encoders import load_reranker
+
+
+def test_health_and_readiness_report_the_load(client):
+    ready = client.get("/readyz")
+    assert ready.status_code == 200
+    assert ready.json()["state"] == "ready"
+    assert "load_ms" in ready.json()["timings"]
+    assert client.get("/healthz").status_code == 200
+
+
+def imported_after(code, **env):
+    """Module names of interest imported by ``code`` in a fresh interpreter."""
+    environ = dict(os.environ, PYTHONPATH=str(ROOT), **env)
+    script = (
+        code
+        + "\nimport sys; print(' '.join(sorted(m for m in sys.modules"
+        " if m in ('faiss', 'torch', 'sentence_transformers'))))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        env=environ,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return out.stdout.split()
+
+
+def test_importing_the_app_loads_no_model_libraries():
+    assert imported_after(
+        "import main", DATABASE_URL=f"sqlite+aiosqlite:///{DB_FILE}"
+    ) == []
+
+
+def test_registry_resolves_versions_without_faiss(built_index):
+    index_file, metadata_file = built_index
+    code = (
+        "from src.registry import IndexRegistry\n"
+        "registry = IndexRegistry()\n"
+        "registry.versions(); registry._watched_files()"
+    )
+    assert imported_after(code, INDEX_FILE=index_file, METADATA_FILE=metadata_file) == []
+
+
+def test_reranker_loads_a_local_directory_offline(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "rerank_model_path", str(tmp_path))
+    reranker = load_reranker()
+    assert isinstance(reranker, FakeCrossEncoder)
+    assert reranker.args == (str(tmp_path),)
+    assert reranker.kwargs["local_files_only"] is True
+
+
+def test_reranker_falls_back_to_the_hub_model(monkeypatch):
+    monkeypatch.setattr(config, "rerank_model_path", "")
+    reranker = load_reranker()
+    assert reranker.args == (config.rerank_model,)
+    assert reranker.kwargs["local_files_only"] is False
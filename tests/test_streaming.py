@@ -0,0 +1,38 @@
+import orjson
+
+
+def events(text):
+    for block in text.strip().split("\n\n"):
+        name, data = block.split("\n")
+        yield name.removeprefix("event: "), orjson.loads(data.removeprefix("data: "))
+
+
+def stream(client, body):
+    return client.post(
+        "/api/chat/completions",
+        params={"api_key": "test-key"},
+        json={**body, "stream": True},
+    )
+
+
+def test_stream_sends_start_each_hit_then_done(client, docs):
+    response = stream(client, {"prompt": docs[3]["content"], "top_k": 4})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["x-accel-buffering"] == "no"
+    sent = list(events(response.text))
+    names = [name for name, _ in sent]
+    assert names == ["start", "result", "result", "result", "result", "done"]
+    assert sent[0][1]["top_k"] == 4
+    assert [data["rank"] for _, data in sent[1:-1]] == [0, 1, 2, 3]
+    assert sent[1][1]["result"]["article_number"] == docs[3]["article_number"]
+    assert sent[-1][1]["count"] == 4
+
+
+def test_stream_hits_match_the_plain_response(client, docs):
+    body = {"prompt": "punishment for theft", "top_k": 3}
+    plain = client.post(
+        "/api/chat/completions", params={"api_key": "test-key"}, json=body
+    ).json()["results"]
+    streamed = [data["result"] for name, data in events(stream(client, body).text)
+                if name == "result"]
+    assert streamed == plain
@@ -0,0 +1,77 @@
+import asyncio
+
+from sqlalchemy.dialects import postgresql
+
+from src.models import UsageLog
+from src.usage import refresh_usage_rollup
+
+
+class RecordingSession:
+    """Answers the rollup's scalar queries and keeps its SQL (as Postgres)."""
+
+    def __init__(self, *scalars):
+        self.scalars = list(scalars)
+        self.statements = []
+        self.commits = 0
+
+    def record(self, stmt):
+        self.statements.append(
+            str(
+                stmt.compile(
+                    dialect=postgresql.dialect(),
+                    compile_kwargs={"literal_binds": True},
+                )
+            )
+        )
+
+    async def scalar(self, stmt):
+        self.record(stmt)
+        return self.scalars.pop(0)
+
+    async def execute(self, stmt):
+        self.record(stmt)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def refresh(*scalars):
+    db = RecordingSession(*scalars)
+    asyncio.run(refresh_usage_rollup(db))
+    return db
+
+
+def test_new_rows_are_found_by_id_after_the_locked_watermark():
+    db = refresh(40, 55)
+    seed, lock, upper, upsert, watermark = db.statements
+    assert "ON CONFLICT (id) DO NOTHING" in seed
+    assert "FOR UPDATE" in lock
+    assert "usagelog.id > 40" in upper
+    # Aged by insert time, so rows retried after a failed flush are not missed
+    assert "usagelog.created_at <" in upper
+    assert "usagelog.timestamp" not in upper
+    assert "usagelog.id > 40" in upsert and "usagelog.id <= 55" in upsert
+    # The log is never range-scanned by time
+    assert "usagelog.timestamp >=" not in upsert
+    assert "usagerollup.count + excluded.count" in upsert
+    assert watermark.startswith("UPDATE usagerollupstate") and "55" in watermark
+    assert db.commits == 1
+
+
+def test_nothing_new_leaves_the_rollup_alone():
+    db = refresh(55, None)
+    assert len(db.statements) == 3
+    assert db.commits == 1
+
+
+def test_the_state_row_exists_before_it_is_locked():
+    db = refresh(0, 3)
+    seed, lock = db.statements[:2]
+    assert seed.startswith("INSERT INTO usagerollupstate") and "(0, 1)" in seed
+    assert "FOR UPDATE" in lock
+    assert "usagelog.id > 0" in db.statements[3]
+
+
+def test_usage_listing_has_a_key_and_id_index():
+    indexes = {tuple(c.name for c in ix.columns) for ix in UsageLog.__table__.indexes}
+    assert ("api_key_id", "id") in indexes
@@ -0,0 +1,86 @@
+"""Compare index types on a corpus: recall@k against exact search, QPS,
+build time and memory.
+
+    python trainer/benchmark_index.py trainer/corpus-v2-out.json --k 10
+
+Queries default to the article names, which look like real user questions;
+pass ``--queries`` with one query per line to use your own.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+from sentence_transformers import SentenceTransformer
+
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from embed_index import INDEX_TYPES, build_index, load_corpus  # noqa: E402
+from src.model_engine import tune_index  # noqa: E402
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def benchmark(corpus_file, index_types, queries_file=None, k=10):
+    docs = load_corpus(corpus_file)
+    if queries_file:
+        with open(queries_file, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = [doc["article_name"] for doc in docs if doc.get("article_name")]
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    embeddings = model.encode(
+        [doc["content"] for doc in docs],
+        normalize_embeddings=True,
+        show_progress_bar=True,
+    )
+    q_embeddings = model.encode(queries, normalize_embeddings=True)
+    k = min(k, len(docs))
+
+    exact = faiss.IndexFlatIP(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(q_embeddings, k)
+
+    print(f"{len(docs)} vectors, {len(queries)} queries, k={k}")
+    print(
+        f"{'index':<12}{'recall@k':>10}{'QPS':>12}{'1-query ms':>12}"
+        f"{'build s':>10}{'memory MB':>11}"
+    )
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_index(embeddings, index_type)
+        build_time = time.perf_counter() - start
+        # Search with the same settings the API would use
+        tune_index(index)
+
+        start = time.perf_counter()
+        _, found = index.search(q_embeddings, k)
+        qps = len(queries) / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for q in q_embeddings[:200]:
+            index.search(q[None, :], k)
+        single_ms = (time.perf_counter() - start) * 1000 / min(200, len(q_embeddings))
+        memory_mb = faiss.serialize_index(index).nbytes / 2**20
+
+        print(
+            f"{index_type:<12}{recall_at_k(found, truth):>10.3f}{qps:>12.0f}"
+            f"{single_ms:>12.3f}{build_time:>10.2f}{memory_mb:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus_file", nargs="?", default="trainer/corpus-v2-out.json")
+    parser.add_argument("--queries", help="File with one query per line")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--index-types", nargs="+", default=list(INDEX_TYPES), metavar="TYPE"
+    )
+    args = parser.parse_args()
+    benchmark(args.corpus_file, args.index_types, args.queries, args.k)
@@ -1,308 +1,271 @@
-import pymupdf
+import argparse
+import json
+import os
 import re
 import unicodedata  # For cleaning non-breaking spaces, etc.
-import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pymupdf
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Structural markers, matched against cleaned lines
+BOOK_RE = re.compile(r"^\s*BOOK\s+([IVXLCDM]+)\s*$", re.IGNORECASE)
+CHAPTER_RE = re.compile(r"^\s*CHAPTER\s+([IVXLCDM]+)\s*$", re.IGNORECASE)
+TITLE_RE = re.compile(r"^\s*TITLE\s+([IVXLCDM]+)\s*$", re.IGNORECASE)
+SECTION_RE = re.compile(r"^\s*Section\s+([IVXLCDM\d]+)\s*[:.-]", re.IGNORECASE)
+ARTICLE_RE = re.compile(r"^\s*Article\s+(\d+)\s*[:.-]", re.IGNORECASE)
+# A short capitalised line on its own, e.g. an article or section name
+NAME_RE = re.compile(r"^[A-Z][a-zA-Z\s,.'()-]+$")
+
+# Blocks this close to the bottom of a page holding only digits are page numbers
+FOOTER_ZONE = 0.07
 
 
 def clean_text(text):
     """Basic text cleaning."""
     text = unicodedata.normalize("NFKD", text)  # Normalize unicode
-    text = re.sub(r"\s+", " ", text)  # Replace multiple whitespace with single space
-    return text.strip()
+    return WHITESPACE_RE.sub(" ", text).strip()
 
 
-def extract_law_structure_pymupdf(pdf_path):
-    documents = []
+def extract_page_lines(pdf_path, first_page, last_page):
+    """Cleaned, non-empty text lines of pages ``first_page`` up to
+    ``last_page``, in reading order.
 
-    current_book = ""
-    current_book_name = ""
-    current_chapter = ""
-    current_chapter_name = ""
-    current_title = ""
-    current_title_name = ""
-    current_section = ""
-    current_section_name = ""
-    current_article_number = ""
-    current_article_name = ""
-    current_article_lines = []
+    Runs in the process pool: getting text out of pages is the slow part and
+    every page can be done on its own, unlike the parsing that follows.
+    """
+    lines = []
+    with pymupdf.open(pdf_path) as doc:
+        for page in doc.pages(first_page, last_page):
+            page_height = page.rect.height
+            # Get text blocks, sorted by vertical position, then horizontal.
+            # This usually gives a good reading order.
+            blocks = page.get_text("blocks", sort=True)
+            for _, _, _, b_y1, block_text, _, block_type in blocks:
+                if block_type != 0:  # 0 indicates a text block
+                    continue
+                is_potential_footer = (page_height - b_y1) < page_height * FOOTER_ZONE
+                if is_potential_footer and block_text.strip().isdigit():
+                    continue
+                for raw_line in block_text.split("\n"):
+                    line = clean_text(raw_line)
+                    if line:
+                        lines.append(line)
+    return lines
 
-    # Regex patterns (same as before, ensure they are robust)
-    book_pattern = re.compile(r"^\s*BOOK\s+([IVXLCDM]+)\s*$", re.IGNORECASE)
-    chapter_pattern = re.compile(r"^\s*CHAPTER\s+([IVXLCDM]+)\s*$", re.IGNORECASE)
-    title_pattern = re.compile(r"^\s*TITLE\s+([IVXLCDM]+)\s*$", re.IGNORECASE)
-    section_pattern = re.compile(r"^\s*Section\s+([IVXLCDM\d]+)\s*[:.-]", re.IGNORECASE)
-    article_pattern = re.compile(r"^\s*Article\s+(\d+)\s*[:.-]", re.IGNORECASE)
 
-    expecting_book_name = False
-    expecting_chapter_name = False
-    expecting_title_name = False
-    expecting_section_name = False
+def iter_lines(pdf_path, workers=None, pages_per_task=16):
+    """All cleaned lines of a PDF in order, extracted by ``workers`` processes.
 
-    def finalize_current_article():
-        nonlocal \
-            current_article_lines, \
-            current_article_number, \
-            current_article_name, \
-            current_book, \
-            current_book_name, \
-            current_chapter, \
-            current_chapter_name, \
-            current_title, \
-            current_title_name, \
-            current_section, \
-            current_section_name
+    Page ranges are submitted a few at a time and consumed in order, so only
+    about ``2 * workers`` ranges of text are held in memory however long the
+    PDF is.
+    """
+    with pymupdf.open(pdf_path) as doc:
+        page_count = doc.page_count
+    ranges = [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for first_page, last_page in ranges:
+            yield from extract_page_lines(pdf_path, first_page, last_page)
+        return
 
-        if current_article_number and current_article_lines:
-            content = " ".join(
-                clean_text(line) for line in current_article_lines if clean_text(line)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for first_page, last_page in ranges:
+            pending.append(
+                pool.submit(extract_page_lines, pdf_path, first_page, last_page)
             )
-            if content:
-                documents.append(
-                    {
-                        "book_roman": current_book,
-                        "book_name": clean_text(current_book_name),
-                        "chapter_roman": current_chapter,
-                        "chapter_name": clean_text(current_chapter_name),
-                        "title_roman": current_title,
-                        "title_name": clean_text(current_title_name),
-                        "section_roman_or_arabic": current_section,
-                        "section_name": clean_text(current_section_name),
-                        "article_number": current_article_number,
-                        "article_name": clean_text(current_article_name),
-                        "content": content,
-                    }
-                )
-        current_article_lines = []
-        # current_article_number = "" # Resetting these here means an article name on its own line won't be captured if it's the *first* thing
-        # current_article_name = "" # Let's reset these when a *new* article is found, not just when finalizing.
-        # Or rather, the reset for number and name should happen when a *new* article is *started*.
-        # The current logic: finalize_current_article is called, then new article details are set. This is okay.
-        # What finalize_current_article *should* do is ensure its own state (lines, number, name) is cleared for the *next potential* accumulation if not immediately followed by a new Article marker.
-        # For this structure, it's fine as `current_article_number` and `name` are reassigned upon matching a new Article.
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
 
-    doc = pymupdf.open(pdf_path)
-    for page_num, page in enumerate(doc):
-        page_height = page.rect.height
-        # Get text blocks, sorted by vertical position, then horizontal.
-        # This usually gives a good reading order.
-        blocks = page.get_text("blocks", sort=True)
 
-        for b_x0, b_y0, b_x1, b_y1, block_text_content, block_no, block_type in blocks:
-            if block_type != 0:  # 0 indicates a text block
-                continue
+class LawStructureParser:
+    """Turns the code's lines, in order, into one document per article.
 
-            # Simple header/footer filtering for blocks that are likely page numbers
-            # Check if the block is near the bottom and contains only digits
-            # Threshold: e.g., bottom 7% of the page height
-            is_potential_footer = (page_height - b_y1) < (page_height * 0.07)
-            block_text_cleaned_for_page_num = block_text_content.strip()
-            if is_potential_footer and block_text_cleaned_for_page_num.isdigit():
-                # print(f"Skipping page number block: '{block_text_cleaned_for_page_num}' on page {page_num+1}")
-                continue
+    Book/chapter/title/section headings set the hierarchy the following
+    articles belong to; their names may follow on the next line(s). Feed
+    lines one at a time: ``feed`` returns an article once the next heading
+    shows it is complete, and ``finish`` returns the last one.
+    """
 
-            # More general header/footer zone skipping (optional, can be too aggressive)
-            # if b_y0 < page_height * 0.05 or b_y1 > page_height * 0.93: # Top 5%, Bottom 7%
-            #     # Be careful not to skip content that happens to be in these zones
-            #     # print(f"Skipping block in header/footer zone: {block_text_content[:30]}...")
-            #     continue
+    def __init__(self):
+        self.book = self.book_name = ""
+        self.chapter = self.chapter_name = ""
+        self.title = self.title_name = ""
+        self.section = self.section_name = ""
+        self.article_number = self.article_name = ""
+        self.article_lines = []
+        # Which heading's name the next line(s) belong to, if any
+        self.expecting = None
 
-            lines_in_block = block_text_content.split("\n")
-            for line_text_raw in lines_in_block:
-                line = clean_text(line_text_raw)  # Clean each line from the block
-                if not line:
-                    continue
+    def _finalize_article(self):
+        document = None
+        if self.article_number and self.article_lines:
+            # Lines are already clean, so joining keeps them clean
+            document = {
+                "book_roman": self.book,
+                "book_name": self.book_name,
+                "chapter_roman": self.chapter,
+                "chapter_name": self.chapter_name,
+                "title_roman": self.title,
+                "title_name": self.title_name,
+                "section_roman_or_arabic": self.section,
+                "section_name": self.section_name,
+                "article_number": self.article_number,
+                "article_name": self.article_name,
+                "content": " ".join(self.article_lines),
+            }
+        self.article_lines = []
+        return document
 
-                # --- Core Parsing Logic (largely same as pdfplumber version) ---
-                book_match = book_pattern.match(line)
-                chapter_match = chapter_pattern.match(line)
-                title_match = title_pattern.match(line)
-                section_match = section_pattern.match(line)
-                article_match = article_pattern.match(line)
+    def feed(self, line):
+        """Consume one cleaned, non-empty line; returns a finished article or None."""
+        # Cheap first-character check before running the heading regexes
+        first = line[0].upper()
+        if first == "B" and (match := BOOK_RE.match(line)):
+            document = self._finalize_article()
+            self.book, self.book_name = match.group(1), ""
+            self.chapter = self.chapter_name = ""
+            self.title = self.title_name = ""
+            self.section = self.section_name = ""
+            self.article_number = self.article_name = ""
+            self.expecting = "book"
+            return document
+        if first == "C" and (match := CHAPTER_RE.match(line)):
+            document = self._finalize_article()
+            self.chapter, self.chapter_name = match.group(1), ""
+            self.title = self.title_name = ""
+            self.section = self.section_name = ""
+            self.article_number = self.article_name = ""
+            self.expecting = "chapter"
+            return document
+        if first == "T" and (match := TITLE_RE.match(line)):
+            document = self._finalize_article()
+            self.title, self.title_name = match.group(1), ""
+            self.section = self.section_name = ""
+            self.article_number = self.article_name = ""
+            self.expecting = "title"
+            return document
+        if first == "S" and (match := SECTION_RE.match(line)):
+            document = self._finalize_article()
+            self.section = match.group(1)
+            self.section_name = line[match.end() :].strip().lstrip(".- ").strip()
+            self.article_number = self.article_name = ""
+            self.expecting = None if self.section_name else "section"
+            return document
+        if first == "A" and (match := ARTICLE_RE.match(line)):
+            document = self._finalize_article()
+            self.article_number = match.group(1)
+            self.article_name = line[match.end() :].strip().lstrip(".- ").strip()
+            self.expecting = None
+            return document
 
-                if book_match:
-                    finalize_current_article()
-                    current_book = book_match.group(1)
-                    current_chapter = ""
-                    current_title = ""
-                    current_section = ""
-                    current_book_name = ""
-                    current_chapter_name = ""
-                    current_title_name = ""
-                    current_section_name = ""
-                    current_article_number = (
-                        ""  # Also reset article when new book starts
-                    )
-                    current_article_name = ""
-                    expecting_book_name = True
-                    expecting_chapter_name = False
-                    expecting_title_name = False
-                    expecting_section_name = False
-                    continue
-                elif chapter_match:
-                    finalize_current_article()
-                    current_chapter = chapter_match.group(1)
-                    current_title = ""
-                    current_section = ""
-                    current_chapter_name = ""
-                    current_title_name = ""
-                    current_section_name = ""
-                    current_article_number = ""  # Also reset article
-                    current_article_name = ""
-                    expecting_book_name = False
-                    expecting_chapter_name = True
-                    expecting_title_name = False
-                    expecting_section_name = False
-                    continue
-                elif title_match:
-                    finalize_current_article()
-                    current_title = title_match.group(1)
-                    current_section = ""
-                    current_title_name = ""
-                    current_section_name = ""
-                    current_article_number = ""  # Also reset article
-                    current_article_name = ""
-                    expecting_book_name = False
-                    expecting_chapter_name = False
-                    expecting_title_name = True
-                    expecting_section_name = False
-                    continue
-                elif section_match:
-                    finalize_current_article()
-                    current_section = section_match.group(1)
-                    current_section_name = (
-                        line[section_match.end() :].strip().lstrip(".- ").strip()
-                    )
-                    current_article_number = ""  # Also reset article
-                    current_article_name = ""
-                    expecting_book_name = False
-                    expecting_chapter_name = False
-                    expecting_title_name = False
-                    if not current_section_name:
-                        expecting_section_name = True
-                    else:
-                        expecting_section_name = False
-                    continue
-                elif article_match:
-                    finalize_current_article()  # Finalize previous article
-                    current_article_number = article_match.group(1)
-                    current_article_name = (
-                        line[article_match.end() :].strip().lstrip(".- ").strip()
-                    )
-                    current_article_lines = []  # Reset for new article's content
-                    expecting_book_name = False
-                    expecting_chapter_name = False
-                    expecting_title_name = False
-                    expecting_section_name = False
-                    continue
+        # Heading names may run over several all-caps lines; a section name
+        # is assumed to be a single line.
+        if self.expecting == "book":
+            self.book_name = (self.book_name + " " + line).strip()
+            if not line.isupper():
+                self.expecting = None
+        elif self.expecting == "chapter":
+            self.chapter_name = (self.chapter_name + " " + line).strip()
+            if not line.isupper():
+                self.expecting = None
+        elif self.expecting == "title":
+            self.title_name = (self.title_name + " " + line).strip()
+            if not line.isupper():
+                self.expecting = None
+        elif self.expecting == "section":
+            self.section_name = (self.section_name + " " + line).strip()
+            self.expecting = None
+        elif self.article_number:
+            # A short capitalised first line is the article's name when it
+            # wasn't on the "Article X.-" line itself
+            if (
+                not self.article_name
+                and not self.article_lines
+                and len(line.split()) < 10
+                and NAME_RE.match(line)
+            ):
+                self.article_name = line
+            else:
+                self.article_lines.append(line)
+        elif self.section and not self.section_name:
+            if len(line.split()) < 10 and NAME_RE.match(line):
+                self.section_name = line
+        return None
 
-                # If we are expecting a name for Book/Chapter/Title/Section
-                is_structural_line = bool(
-                    book_match
-                    or chapter_match
-                    or title_match
-                    or section_match
-                    or article_match
-                )
+    def finish(self):
+        """The last article, once there are no more lines."""
+        return self._finalize_article()
 
-                if expecting_book_name and not is_structural_line:
-                    current_book_name = (current_book_name + " " + line).strip()
-                    if line.isupper():
-                        pass  # Continue if all caps (heuristic for multi-line titles)
-                    else:
-                        expecting_book_name = False
-                    continue
-                elif expecting_chapter_name and not is_structural_line:
-                    current_chapter_name = (current_chapter_name + " " + line).strip()
-                    if line.isupper():
-                        pass
-                    else:
-                        expecting_chapter_name = False
-                    continue
-                elif expecting_title_name and not is_structural_line:
-                    current_title_name = (current_title_name + " " + line).strip()
-                    if line.isupper():
-                        pass
-                    else:
-                        expecting_title_name = False
-                    continue
-                elif expecting_section_name and not is_structural_line:
-                    current_section_name = (current_section_name + " " + line).strip()
-                    expecting_section_name = (
-                        False  # Assume section names are usually one line after marker
-                    )
-                    continue
 
-                # Accumulate article content
-                if current_article_number:
-                    # If current_article_name is still empty (wasn't on the "Article X.-" line)
-                    # and this line looks like a title (e.g. starts with capital, few words)
-                    # and it's the first line collected for this article.
-                    if (
-                        not current_article_name
-                        and re.match(r"^[A-Z][a-zA-Z\s,.'()-]+$", line)
-                        and len(line.split()) < 10
-                        and not current_article_lines
-                    ):
-                        current_article_name = line
-                    else:
-                        current_article_lines.append(
-                            line_text_raw
-                        )  # Append raw line to preserve original spacing for joining
-                elif (
-                    current_section
-                    and not current_section_name
-                    and not is_structural_line
-                    and not expecting_section_name
-                ):
-                    # This case might be redundant due to expecting_section_name logic, but can be a fallback
-                    if (
-                        re.match(r"^[A-Z][a-zA-Z\s,.'()-]+$", line)
-                        and len(line.split()) < 10
-                    ):  # Heuristic for section name
-                        current_section_name = line
-                # --- End of Core Parsing Logic ---
+def iter_law_structure(pdf_path, workers=None, pages_per_task=16):
+    """Articles of one PDF as they are parsed, without holding them all."""
+    parser = LawStructureParser()
+    for line in iter_lines(pdf_path, workers, pages_per_task):
+        document = parser.feed(line)
+        if document:
+            yield document
+    document = parser.finish()
+    if document:
+        yield document
 
-    finalize_current_article()  # Finalize the very last article after all pages
-    doc.close()
-    return documents
 
+def extract_law_structure_pymupdf(pdf_path, workers=None):
+    return list(iter_law_structure(pdf_path, workers))
 
-# --- Main execution (similar to before, for testing) ---
-if __name__ == "__main__":
-    pdf_file = "C:\\Users\\nahom\\Desktop\\assignment\\ET_Criminal_Code.pdf"
 
-    try:
-        documents = extract_law_structure_pymupdf(pdf_file)
+def write_corpus(documents, output_file):
+    """Stream documents to ``output_file``: one per line for ``.jsonl``,
+    otherwise a JSON array. Returns how many were written."""
+    jsonl = output_file.endswith(".jsonl")
+    count = 0
+    with open(output_file, "w", encoding="utf-8") as f:
+        if not jsonl:
+            f.write("[\n")
+        for document in documents:
+            if count and not jsonl:
+                f.write(",\n")
+            f.write(json.dumps(document, ensure_ascii=False))
+            if jsonl:
+                f.write("\n")
+            count += 1
+        if not jsonl:
+            f.write("\n]\n")
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract articles from criminal code PDFs into a corpus."
+    )
+    parser.add_argument(
+        "pdf_files",
+        nargs="*",
+        default=["trainer/ET_Criminal_Code.pdf"],
+        help="The code and any amendment gazettes, each parsed on its own",
+    )
+    parser.add_argument("--output", default="trainer/corpus-v2-out.json")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Extraction processes (default: CPUs)"
+    )
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    args = parser.parse_args()
 
-        if documents:
-            for i, doc_item in enumerate(documents):
-                print(f"--- Document {i + 1} ---")
-                print(f"  Book: {doc_item['book_roman']} ({doc_item['book_name']})")
-                print(
-                    f"  Chapter: {doc_item['chapter_roman']} ({doc_item['chapter_name']})"
-                )
-                print(f"  Title: {doc_item['title_roman']} ({doc_item['title_name']})")
-                print(
-                    f"  Section: {doc_item['section_roman_or_arabic']} ({doc_item['section_name']})"
-                )
-                print(
-                    f"  Article: {doc_item['article_number']} ({doc_item['article_name']})"
-                )
-                print(f"  Content: {doc_item['content'][:200]}...")
-                print("-" * 20)
-                break
-            with open("corpus-v2-out.json", "w") as f:
-                json.dump(documents, f, indent=4)
-                print("Documents saved to corpus-v2-out.json")
-        else:
-            print("No documents extracted. Check PDF content and parsing logic.")
+    def documents():
+        for pdf_file in args.pdf_files:
+            yield from iter_law_structure(pdf_file, args.workers, args.pages_per_task)
 
-    except pymupdf.FileNotFoundError:
-        print(
-            f"ERROR: PDF file '{pdf_file}' not found. Please ensure it exists in the correct path."
-        )
-    except Exception as e:
-        print(f"An error occurred during PDF processing: {e}")
-        print(
-            "Ensure 'PyMuPDF' (import pymupdf) and 'reportlab' (for dummy PDF) are installed."
-        )
+    count = write_corpus(documents(), args.output)
+    if count:
+        print(f"{count} articles saved to {args.output}")
+    else:
+        print("No documents extracted. Check PDF content and parsing logic.")
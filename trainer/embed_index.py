@@ -1,42 +1,355 @@
+import argparse
+import hashlib
+import itertools
 import json
+import math
+import os
+import sys
+from pathlib import Path
+
 import faiss
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
+# Add the parent directory to the system path
+parent_dir = Path(__file__).resolve().parent.parent
+if str(parent_dir) not in sys.path:
+    sys.path.append(str(parent_dir))
+
+from src import config  # noqa: E402
+from src.encoders import MODEL_NAME  # noqa: E402
+from src.lexical import BM25Index, bm25_path  # noqa: E402
+from src.metadata_store import store_path, write_metadata_store  # noqa: E402
+from src.index_files import ids_path  # noqa: E402
+
+# Index types selectable at build time, as faiss.index_factory strings.
+# "flat" is exact brute force; the others trade some recall for speed and
+# memory as the corpus grows. Any other factory string is accepted as is.
+INDEX_TYPES = {
+    "flat": "Flat",
+    "ivf-flat": "IVF{nlist},Flat",
+    "ivf-pq": "IVF{nlist},PQ{m}",
+    "hnsw": "HNSW32",
+    "sq8": "SQ8",
+}
+
+
+def index_spec(index_type, n_vectors, dimension):
+    # ~4*sqrt(n) lists is the usual starting point for IVF, and PQ works well
+    # with about 8 dimensions per sub-quantizer.
+    nlist = max(1, min(65536, int(4 * math.sqrt(n_vectors))))
+    m = max(1, dimension // 8)
+    while dimension % m:
+        m -= 1
+    return INDEX_TYPES.get(index_type, index_type).format(nlist=nlist, m=m)
+
+
+# Vectors added to an index per call, so memory-mapped embeddings are read
+# a slice at a time rather than all at once.
+ADD_BATCH = 65536
+
+
+def build_index(embeddings, index_type="flat", ids=None):
+    """Build an inner-product index; embeddings must be L2-normalized, so
+    scores are cosine similarities. With ``ids`` the index is wrapped in an
+    IndexIDMap2 so vectors keep those ids and can be removed one by one."""
+    dimension = embeddings.shape[1]
+    index = faiss.index_factory(
+        dimension,
+        index_spec(index_type, len(embeddings), dimension),
+        faiss.METRIC_INNER_PRODUCT,
+    )
+    if not index.is_trained:
+        index.train(embeddings)
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+    for start in range(0, len(embeddings), ADD_BATCH):
+        part = np.ascontiguousarray(embeddings[start : start + ADD_BATCH])
+        if ids is None:
+            index.add(part)
+        else:
+            index.add_with_ids(part, ids[start : start + ADD_BATCH])
+    return index
+
+
+def load_corpus(corpus_file):
+    """Articles from a JSON array or a JSONL file (as corpusv2.py writes)."""
+    with open(corpus_file, "r", encoding="utf-8") as f:
+        if corpus_file.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+# Fields that decide whether an article needs a new embedding: where it sits
+# in the code and its text. Other metadata changes only rewrite the metadata.
+HASH_FIELDS = ("book_roman", "chapter_roman", "article_number", "content")
+
+
+def article_hash(doc):
+    h = hashlib.sha256()
+    for field in HASH_FIELDS:
+        h.update(str(doc.get(field) or "").encode("utf-8") + b"\0")
+    return h.hexdigest()
+
+
+def corpus_keys(docs):
+    """Each article's hash; the same article twice in the corpus still
+    needs two vectors, so repeats get a counter."""
+    seen = {}
+    for doc in docs:
+        key = article_hash(doc)
+        seen[key] = seen.get(key, 0) + 1
+        yield key if seen[key] == 1 else f"{key}#{seen[key]}"
+
+
+# all-MiniLM-L6-v2 reads at most 256 word pieces and ignores the rest, so
+# long articles are embedded as overlapping windows of words instead; at
+# roughly 1.3 pieces per word 160 words stays within the limit.
+CHUNK_WORDS = 160
+CHUNK_OVERLAP = 40
+
+
+def chunk_text(text, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """``text`` as windows of ``size`` words, each sharing ``overlap`` words
+    with the one before. Short texts (or ``size`` 0) are a single chunk."""
+    words = text.split()
+    if size <= 0 or len(words) <= size:
+        return [text]
+    if not 0 <= overlap < size:
+        raise ValueError("chunk overlap must be smaller than the chunk size")
+    step = size - overlap
+    # A window starting any later would add nothing to the one before it
+    return [
+        " ".join(words[start : start + size])
+        for start in range(0, len(words) - overlap, step)
+    ]
+
+
+def corpus_chunks(docs, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """``(row, key, text)`` for every chunk of every article, keyed by the
+    article's hash and the chunk's position in it."""
+    docs, hashed = itertools.tee(docs)
+    for row, (doc, key) in enumerate(zip(docs, corpus_keys(hashed))):
+        for i, text in enumerate(chunk_text(doc["content"], size, overlap)):
+            yield row, f"{key}:{i}", text
+
+
+def embeddings_path(index_file):
+    return os.path.splitext(index_file)[0] + ".embeddings.npz"
+
+
+def load_embedding_store(path, model_name, chunking=(CHUNK_WORDS, CHUNK_OVERLAP)):
+    """``({chunk key: (id, vector)}, next_id, index_type)`` from an earlier build."""
+    if not os.path.exists(path):
+        return {}, 0, None
+    with np.load(path) as data:
+        # Vectors from another model, or of differently cut chunks, can't be
+        # mixed with new ones
+        if str(data["model"]) != model_name:
+            return {}, 0, None
+        if "chunking" not in data or tuple(data["chunking"]) != tuple(chunking):
+            return {}, 0, None
+        entries = {
+            str(key): (int(i), vector)
+            for key, i, vector in zip(data["keys"], data["ids"], data["vectors"])
+        }
+        return entries, int(data["next_id"]), str(data["index_type"])
+
+
+def save_embedding_store(
+    path, model_name, keys, ids, vectors, next_id, index_type, chunking
+):
+    tmp = path + ".tmp.npz"
+    np.savez(
+        tmp,
+        model=model_name,
+        index_type=index_type,
+        chunking=np.asarray(chunking, dtype=np.int64),
+        next_id=next_id,
+        keys=np.asarray(keys, dtype=str),
+        ids=np.asarray(ids, dtype=np.int64),
+        vectors=np.asarray(vectors, dtype=np.float32),
+    )
+    os.replace(tmp, path)
+
+
+def update_index(index_file, removed_ids, added_ids, added_vectors):
+    """Apply removals and additions to the index from the last build, or
+    return None when it has to be rebuilt instead."""
+    if not os.path.exists(index_file):
+        return None
+    index = faiss.read_index(index_file)
+    if not isinstance(faiss.downcast_index(index), faiss.IndexIDMap):
+        return None  # built before stable ids
+    try:
+        if len(removed_ids):
+            index.remove_ids(np.asarray(removed_ids, dtype=np.int64))
+        if len(added_ids):
+            index.add_with_ids(added_vectors, added_ids)
+    except RuntimeError:
+        return None  # e.g. HNSW can't remove vectors
+    return index
+
+
+def save_json(path, docs):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(docs, f, ensure_ascii=False)
+
+
+def save_ids(path, vector_ids, rows):
+    """The (vector id, metadata row) pairs the API maps search results with,
+    written a slice at a time so memory-mapped rows stay on disk."""
+    # open_memmap takes the name as is; np.save would append .npy to it
+    pairs = np.lib.format.open_memmap(
+        path, mode="w+", dtype=np.int64, shape=(len(rows), 2)
+    )
+    for start in range(0, len(rows), ADD_BATCH):
+        end = start + ADD_BATCH
+        pairs[start:end, 0] = vector_ids[start:end]
+        pairs[start:end, 1] = rows[start:end]
+    pairs.flush()
+    del pairs
+
+
+def write_atomic(path, write):
+    tmp = path + ".tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
 
 # Function to index documents and create FAISS index
-def index_corpus(corpus_file, index_file, metadata_file):
+def index_corpus(
+    corpus_file,
+    index_file,
+    metadata_file,
+    index_type="flat",
+    rebuild=False,
+    chunk_words=CHUNK_WORDS,
+    chunk_overlap=CHUNK_OVERLAP,
+):
+    """Index the corpus, re-encoding only articles that changed since the
+    last run. Long articles get one vector per chunk (see ``chunk_text``).
+    Embeddings are kept in ``<index>.embeddings.npz`` under each chunk's key,
+    and every chunk keeps its vector id while its article's hash stays the
+    same, so the existing index only needs the differences."""
     # Load the structured articles
-    with open(corpus_file, "r", encoding="utf-8") as f:
-        docs = json.load(f)
+    docs = load_corpus(corpus_file)
 
-    # Use a SentenceTransformer model
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+    model_name = config.model_path or MODEL_NAME
+    store_file = embeddings_path(index_file)
+    chunking = (chunk_words, chunk_overlap)
+    cached, next_id, built_type = (
+        ({}, 0, None)
+        if rebuild
+        else load_embedding_store(store_file, model_name, chunking)
+    )
 
-    # Convert texts to embeddings
-    texts = [doc["content"] for doc in docs]
-    embeddings = model.encode(texts, show_progress_bar=True)
+    chunks = list(corpus_chunks(docs, chunk_words, chunk_overlap))
+    keys = [key for _, key, _ in chunks]
+    rows = np.array([row for row, _, _ in chunks], dtype=np.int64)
 
-    # Build the FAISS index
-    dimension = embeddings[0].shape[0]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
+    entries = {key: cached[key] for key in keys if key in cached}
+    new = [j for j, key in enumerate(keys) if key not in entries]
+    removed_ids = [i for key, (i, _) in cached.items() if key not in entries]
 
-    # Optional: Save the index for later use
-    faiss.write_index(index, index_file)
+    if new:
+        model = SentenceTransformer(model_name)
+        vectors = model.encode(
+            [chunks[j][2] for j in new],
+            normalize_embeddings=True,
+            show_progress_bar=True,
+        )
+        for j, vector in zip(new, vectors):
+            entries[keys[j]] = (next_id, vector)
+            next_id += 1
+
+    vector_ids = np.array([entries[key][0] for key in keys], dtype=np.int64)
+    index = None
+    if built_type == index_type:
+        index = update_index(
+            index_file,
+            removed_ids,
+            vector_ids[new],
+            np.array([entries[keys[j]][1] for j in new], dtype=np.float32),
+        )
+    if index is None or index.ntotal != len(chunks):
+        # Rebuild from the stored embeddings; still no re-encoding
+        vectors = np.array([entries[key][1] for key in keys], dtype=np.float32)
+        index = build_index(vectors, index_type, ids=vector_ids)
+        updated = False
+    else:
+        updated = True
+
+    # Readers stat and open these files, so replace them whole
+    write_atomic(index_file, lambda path: faiss.write_index(index, path))
+    write_atomic(
+        ids_path(index_file), lambda path: save_ids(path, vector_ids, rows)
+    )
 
     # Save metadata so we can retrieve it by index
-    with open(metadata_file, "w", encoding="utf-8") as f:
-        json.dump(docs, f, ensure_ascii=False)
+    write_atomic(metadata_file, lambda path: save_json(path, docs))
+
+    # Compact copy the API memory-maps instead of parsing the JSON
+    write_metadata_store(docs, store_path(metadata_file))
+
+    # Lexical index for hybrid search, so the API does not re-tokenize
+    BM25Index.build(docs).save(bm25_path(index_file))
+
+    save_embedding_store(
+        store_file,
+        model_name,
+        list(entries),
+        [i for i, _ in entries.values()],
+        [vector for _, vector in entries.values()],
+        next_id,
+        index_type,
+        chunking,
+    )
 
+    print(
+        f"{len(docs)} articles in {len(chunks)} chunks: "
+        f"{len(chunks) - len(new)} unchanged, {len(new)} encoded, "
+        f"{len(removed_ids)} removed; index {'updated' if updated else 'rebuilt'}."
+    )
     print(
         f"Indexing complete. FAISS index saved to {index_file} and metadata saved to {metadata_file}"
     )
 
 
-# Example usage
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed a corpus and build the index.")
+    parser.add_argument("corpus_file", nargs="?", default="trainer/corpus-v2-out.json")
+    parser.add_argument("index_file", nargs="?", default="criminal_code_v2.index")
+    parser.add_argument("metadata_file", nargs="?", default="faiss_metadata_v2.json")
+    parser.add_argument(
+        "--index-type",
+        default="flat",
+        help=f"One of {', '.join(INDEX_TYPES)} or a faiss.index_factory string",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Ignore stored embeddings and re-encode every article",
+    )
+    parser.add_argument(
+        "--chunk-words",
+        type=int,
+        default=CHUNK_WORDS,
+        help="Split longer articles into chunks of this many words (0: don't)",
+    )
+    parser.add_argument(
+        "--chunk-overlap",
+        type=int,
+        default=CHUNK_OVERLAP,
+        help="Words each chunk shares with the previous one",
+    )
+    args = parser.parse_args()
     index_corpus(
-        "C:\\Users\\nahom\\Desktop\\assignment\\faiss_api\\trainer\\corpus-v2-out.json",
-        "criminal_code_v2.index",
-        "faiss_metadata_v2.json",
+        args.corpus_file,
+        args.index_file,
+        args.metadata_file,
+        args.index_type,
+        args.rebuild,
+        args.chunk_words,
+        args.chunk_overlap,
     )
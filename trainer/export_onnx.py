@@ -0,0 +1,137 @@
+"""Export the query encoder to ONNX and check it against the original model.
+
+    python -m trainer.export_onnx                  # fp32 ONNX
+    python -m trainer.export_onnx --quantize       # int8 ONNX, smaller/faster
+    python -m trainer.export_onnx --check-only --backend torch-int8
+
+Writes the model, its tokenizer and ``encoder.json`` to ``--output``
+(ONNX_MODEL_DIR by default), which is what ENCODER_BACKEND=onnx loads. Every
+export ends with a parity check: article names and texts from the corpus are
+embedded by both the fp32 SentenceTransformer and the new backend, and the
+script exits non-zero if any pair is less similar than ``--min-cosine``.
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+parent_dir = Path(__file__).resolve().parent.parent
+if str(parent_dir) not in sys.path:
+    sys.path.append(str(parent_dir))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from embed_index import load_corpus  # noqa: E402
+from src import config  # noqa: E402
+from src.encoders import MODEL_NAME, BACKENDS, OnnxEncoder, torch_encoder  # noqa: E402
+
+
+class HiddenStates(torch.nn.Module):
+    """The transformer with named inputs and only its token embeddings out."""
+
+    def __init__(self, transformer, names):
+        super().__init__()
+        self.transformer = transformer
+        self.names = names
+
+    def forward(self, *inputs):
+        outputs = self.transformer(**dict(zip(self.names, inputs)), return_dict=True)
+        return outputs.last_hidden_state
+
+
+def export(model, output_dir, quantize=False):
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = model.tokenizer
+    sample = tokenizer(["an example query"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    transformer = HiddenStates(model[0].auto_model, names).eval()
+    dynamic = {0: "batch", 1: "tokens"}
+
+    fp32_file = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[n] for n in names),
+            fp32_file,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={n: dynamic for n in names + ["last_hidden_state"]},
+            opset_version=17,
+            dynamo=False,
+        )
+    model_file = "model.onnx"
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        model_file = "model.int8.onnx"
+        quantize_dynamic(
+            fp32_file, os.path.join(output_dir, model_file), weight_type=QuantType.QInt8
+        )
+
+    tokenizer.save_pretrained(output_dir)
+    info = {
+        "model": MODEL_NAME,
+        "model_file": model_file,
+        "max_seq_length": model.max_seq_length,
+        "pad_token_id": tokenizer.pad_token_id,
+        "dimension": model.get_sentence_embedding_dimension(),
+    }
+    with open(os.path.join(output_dir, "encoder.json"), "w") as f:
+        json.dump(info, f, indent=2)
+    print(f"Exported {model_file} to {output_dir}")
+
+
+def parity_texts(corpus_file, limit):
+    docs = load_corpus(corpus_file)
+    texts = []
+    for doc in docs[:limit]:
+        texts.append(doc.get("article_name") or doc["content"][:200])
+        texts.append(doc["content"])
+    return texts
+
+
+def check_parity(reference, candidate, texts):
+    """Cosine similarity between the two encoders' embeddings of ``texts``."""
+    expected = reference.encode(texts, normalize_embeddings=True)
+    actual = candidate.encode(texts, normalize_embeddings=True)
+    return np.sum(np.asarray(expected) * np.asarray(actual), axis=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the query encoder to ONNX.")
+    parser.add_argument("--model", default=config.model_path or MODEL_NAME)
+    parser.add_argument("--output", default=config.onnx_model_dir)
+    parser.add_argument("--quantize", action="store_true", help="int8 weights")
+    parser.add_argument(
+        "--check-only", action="store_true", help="skip the export, only compare"
+    )
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS)
+    parser.add_argument("--corpus", default="trainer/corpus-v2-out.json")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    reference = SentenceTransformer(args.model, device="cpu")
+    if not args.check_only:
+        export(reference, args.output, args.quantize)
+
+    if args.backend == "onnx":
+        candidate = OnnxEncoder(args.output, config.encoder_threads)
+    else:
+        candidate = torch_encoder(
+            args.backend == "torch-int8", config.encoder_threads, args.model
+        )
+    similarity = check_parity(
+        reference, candidate, parity_texts(args.corpus, args.samples)
+    )
+    print(
+        f"{args.backend} vs fp32 on {len(similarity)} texts: "
+        f"min cosine {similarity.min():.5f}, mean {similarity.mean():.5f}"
+    )
+    if similarity.min() < args.min_cosine:
+        sys.exit(f"Parity check failed: below --min-cosine {args.min_cosine}")
@@ -0,0 +1,328 @@
+"""Ingest criminal code PDFs straight into a servable index.
+
+    python trainer/pipeline.py trainer/ET_Criminal_Code.pdf [gazette.pdf ...] --batch-size 128
+
+Stages run as one stream: pages are extracted and cleaned by a process pool
+(corpusv2.py), parsed into articles, split into chunks if long, embedded
+``--batch-size`` articles at a time and appended to a checkpoint directory.
+Once every article is embedded, each vector's metadata row and embedding
+store key are streamed to files next to the vectors, and the index, id map,
+embedding store and metadata are written from those memory-mapped files and
+the checkpointed records a slice at a time. What is held in memory whole is
+what the outputs need whole: the FAISS index, the BM25 postings, an id per
+vector and the hashes that tell repeated articles apart.
+
+If a run is interrupted, the same command resumes after the last
+checkpointed batch. A checkpoint made from other PDFs, another model or
+other chunk settings is discarded. The outputs are the files embed_index.py
+writes, including its embedding store, so later amendments can be indexed
+incrementally with it.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+parent_dir = Path(__file__).resolve().parent.parent
+if str(parent_dir) not in sys.path:
+    sys.path.append(str(parent_dir))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from corpusv2 import iter_law_structure, write_corpus  # noqa: E402
+from embed_index import (  # noqa: E402
+    ADD_BATCH,
+    CHUNK_OVERLAP,
+    CHUNK_WORDS,
+    INDEX_TYPES,
+    build_index,
+    chunk_text,
+    corpus_chunks,
+    embeddings_path,
+    save_embedding_store,
+    save_ids,
+    write_atomic,
+)
+from src import config  # noqa: E402
+from src.encoders import MODEL_NAME  # noqa: E402
+from src.lexical import BM25Index, bm25_path  # noqa: E402
+from src.metadata_store import store_path, write_metadata_store  # noqa: E402
+from src.index_files import ids_path  # noqa: E402
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def input_fingerprint(path):
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+
+class Checkpoint:
+    """Articles embedded so far: ``records.jsonl`` and ``vectors.f32`` (raw
+    float32 rows, one per chunk) in ``directory``, with ``state.json``
+    recording how much of them is complete. Anything past that, e.g. half a
+    batch written when the run was killed, is cut off on load."""
+
+    def __init__(self, directory, inputs, model_name, chunking):
+        self.directory = directory
+        self.records_file = os.path.join(directory, "records.jsonl")
+        self.vectors_file = os.path.join(directory, "vectors.f32")
+        self.state_file = os.path.join(directory, "state.json")
+        self.fingerprint = {
+            "inputs": [input_fingerprint(path) for path in inputs],
+            "model": model_name,
+            "chunking": list(chunking),
+        }
+        self.count = 0
+        self.vector_count = 0
+        self.records_bytes = 0
+        self.dimension = 0
+
+        state = None
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        if state and state["fingerprint"] == self.fingerprint:
+            self.count = state["count"]
+            self.vector_count = state["vector_count"]
+            self.records_bytes = state["records_bytes"]
+            self.dimension = state["dimension"]
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        for path, size in (
+            (self.records_file, self.records_bytes),
+            (self.vectors_file, self.vector_count * self.dimension * 4),
+        ):
+            with open(path, "ab") as f:
+                f.truncate(size)
+
+    def append(self, records, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with open(self.records_file, "ab") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+            self.records_bytes = f.tell()
+        with open(self.vectors_file, "ab") as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.count += len(records)
+        self.vector_count += len(vectors)
+        self.dimension = vectors.shape[1]
+        state = {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "vector_count": self.vector_count,
+            "records_bytes": self.records_bytes,
+            "dimension": self.dimension,
+        }
+        write_atomic(self.state_file, lambda path: save_state(path, state))
+
+    def records(self):
+        with open(self.records_file, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def vectors(self):
+        return np.memmap(
+            self.vectors_file,
+            dtype=np.float32,
+            mode="r",
+            shape=(self.vector_count, self.dimension),
+        )
+
+    def chunk_index(self, chunk_words, chunk_overlap):
+        """``(rows, keys)``: each vector's metadata row and embedding store key,
+        as memory-mapped arrays in the checkpoint directory. Chunking the
+        records again is cheaper than checkpointing these with every batch."""
+        rows = np.lib.format.open_memmap(
+            os.path.join(self.directory, "rows.npy"),
+            mode="w+",
+            dtype=np.int64,
+            shape=(self.vector_count,),
+        )
+        keys_file = os.path.join(self.directory, "keys.txt")
+        count = width = 0
+        chunks = corpus_chunks(self.records(), chunk_words, chunk_overlap)
+        with open(keys_file, "w", encoding="utf-8") as f:
+            for batch in batched(chunks, ADD_BATCH):
+                rows[count : count + len(batch)] = [row for row, _, _ in batch]
+                for _, key, _ in batch:
+                    f.write(key + "\n")
+                    width = max(width, len(key))
+                count += len(batch)
+        if count != self.vector_count:
+            raise RuntimeError(
+                f"{count} chunks but {self.vector_count} vectors in {self.directory}"
+            )
+
+        # Fixed-width, as the embedding store keeps them, so a second pass
+        keys = np.lib.format.open_memmap(
+            os.path.join(self.directory, "keys.npy"),
+            mode="w+",
+            dtype=f"<U{width}",
+            shape=(self.vector_count,),
+        )
+        with open(keys_file, "r", encoding="utf-8") as f:
+            lines = (line.rstrip("\n") for line in f)
+            for i, batch in enumerate(batched(lines, ADD_BATCH)):
+                keys[i * ADD_BATCH : i * ADD_BATCH + len(batch)] = batch
+        return rows, keys
+
+
+def save_state(path, state):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+
+def run_pipeline(
+    pdf_files,
+    index_file,
+    metadata_file,
+    index_type="flat",
+    batch_size=256,
+    workers=None,
+    checkpoint_dir=None,
+    keep_checkpoint=False,
+    chunk_words=CHUNK_WORDS,
+    chunk_overlap=CHUNK_OVERLAP,
+):
+    model_name = config.model_path or MODEL_NAME
+    chunking = (chunk_words, chunk_overlap)
+    checkpoint = Checkpoint(
+        checkpoint_dir or os.path.splitext(index_file)[0] + ".checkpoint",
+        pdf_files,
+        model_name,
+        chunking,
+    )
+    if checkpoint.count:
+        print(f"Resuming after {checkpoint.count} checkpointed articles")
+
+    documents = itertools.chain.from_iterable(
+        iter_law_structure(pdf_file, workers) for pdf_file in pdf_files
+    )
+    # Parsing again is cheap next to encoding, so skip what's already embedded
+    documents = itertools.islice(documents, checkpoint.count, None)
+
+    model = None
+    start = time.perf_counter()
+    for batch in batched(documents, batch_size):
+        if model is None:
+            model = SentenceTransformer(model_name)
+        vectors = model.encode(
+            [
+                text
+                for doc in batch
+                for text in chunk_text(doc["content"], chunk_words, chunk_overlap)
+            ],
+            normalize_embeddings=True,
+            batch_size=batch_size,
+        )
+        checkpoint.append(batch, vectors)
+        rate = checkpoint.count / (time.perf_counter() - start)
+        print(f"{checkpoint.count} articles embedded ({rate:.0f}/s)", flush=True)
+
+    if not checkpoint.count:
+        print("No documents extracted. Check PDF content and parsing logic.")
+        return
+
+    vectors = checkpoint.vectors()
+    ids = np.arange(checkpoint.vector_count, dtype=np.int64)
+    rows, keys = checkpoint.chunk_index(chunk_words, chunk_overlap)
+    index = build_index(vectors, index_type, ids=ids)
+
+    # Same files, written the same way, as embed_index.index_corpus
+    write_atomic(index_file, lambda path: faiss.write_index(index, path))
+    write_atomic(ids_path(index_file), lambda path: save_ids(path, ids, rows))
+    write_atomic(metadata_file, lambda path: write_corpus(checkpoint.records(), path))
+    write_metadata_store(checkpoint.records(), store_path(metadata_file))
+    BM25Index.build(checkpoint.records()).save(bm25_path(index_file))
+    save_embedding_store(
+        embeddings_path(index_file),
+        model_name,
+        keys,
+        ids,
+        vectors,
+        checkpoint.vector_count,
+        index_type,
+        chunking,
+    )
+
+    del vectors, rows, keys
+    if not keep_checkpoint:
+        shutil.rmtree(checkpoint.directory)
+    print(
+        f"Indexing complete. {checkpoint.count} articles in "
+        f"{checkpoint.vector_count} chunks; FAISS index saved to "
+        f"{index_file} and metadata saved to {metadata_file}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract, embed and index criminal code PDFs in one stream."
+    )
+    parser.add_argument(
+        "pdf_files", nargs="*", default=["trainer/ET_Criminal_Code.pdf"]
+    )
+    parser.add_argument("--index-file", default=config.index_file)
+    parser.add_argument("--metadata-file", default=config.metadata_file)
+    parser.add_argument(
+        "--index-type",
+        default="flat",
+        help=f"One of {', '.join(INDEX_TYPES)} or a faiss.index_factory string",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=256, help="Articles embedded per batch"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Extraction processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--checkpoint-dir", default=None, help="Default: <index file>.checkpoint"
+    )
+    parser.add_argument(
+        "--keep-checkpoint",
+        action="store_true",
+        help="Keep the checkpoint directory after a successful run",
+    )
+    parser.add_argument(
+        "--chunk-words",
+        type=int,
+        default=CHUNK_WORDS,
+        help="Split longer articles into chunks of this many words (0: don't)",
+    )
+    parser.add_argument(
+        "--chunk-overlap",
+        type=int,
+        default=CHUNK_OVERLAP,
+        help="Words each chunk shares with the previous one",
+    )
+    args = parser.parse_args()
+    run_pipeline(
+        args.pdf_files,
+        args.index_file,
+        args.metadata_file,
+        args.index_type,
+        args.batch_size,
+        args.workers,
+        args.checkpoint_dir,
+        args.keep_checkpoint,
+        args.chunk_words,
+        args.chunk_overlap,
+    )